@@ -0,0 +1,81 @@
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_export import period_key
+from timesheet import parse_record, format_duration
+
+# Hours of many workers at once. The rows are split by worker into one
+# partition per process, every process parses its rows and sums the minutes
+# per (worker, site, period), and the partial sums are merged at the end.
+# A worker's rows always land in the same partition, so the partial sums of
+# two processes never share a key and the merge is a plain dict update.
+#
+# Site is the Kunde/Adresse column.
+
+DIMENSIONS = ("worker", "site", "period")
+PARALLEL_MIN_ROWS = 20000  # below this starting the processes costs more than it saves
+
+
+def partition(records, parts):
+    # [[(line, worker, record), ...] per process]
+    partitions = [[] for _ in range(parts)]
+    for line, record in enumerate(records, start=2):
+        try:
+            worker = record["Navn"]
+        except KeyError as e:
+            raise ValueError(f"Row {line}: missing column {e}") from None
+        partitions[zlib.crc32(worker.encode()) % parts].append((line, worker, record))
+    return partitions
+
+
+def reduce_partition(rows, period="month"):
+    sums = {}
+    for line, worker, record in rows:
+        try:
+            shift = parse_record(record)
+        except KeyError as e:
+            raise ValueError(f"Row {line}: missing column {e}") from None
+        except ValueError as e:
+            raise ValueError(f"Row {line}: {e}") from None
+        key = (worker, shift.customer, period_key(shift.day, period))
+        sums[key] = sums.get(key, 0) + shift.minutes
+    return sums
+
+
+def aggregate(records, period="month", workers=None):
+    # {(worker, site, period): minutes}
+    workers = workers or os.cpu_count() or 1
+    partitions = partition(records, workers)
+    if workers == 1 or sum(map(len, partitions)) < PARALLEL_MIN_ROWS:
+        return reduce_partition([row for rows in partitions for row in rows], period)
+
+    sums = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial in executor.map(reduce_partition, partitions, [period] * len(partitions)):
+            sums.update(partial)
+    return sums
+
+
+def summary_table(sums, rows="period", columns="worker"):
+    # Pivot table for pdf_export.build_pdf: header, one row per `rows` value with
+    # a column per `columns` value and a row total, and the column sums last
+    row_index, column_index = DIMENSIONS.index(rows), DIMENSIONS.index(columns)
+    cells = {}
+    for key, minutes in sums.items():
+        cell = (key[row_index], key[column_index])
+        cells[cell] = cells.get(cell, 0) + minutes
+    row_keys = sorted({row for row, _ in cells})
+    column_keys = sorted({column for _, column in cells})
+
+    table_data = [[""] + column_keys + ["Sum"]]
+    column_totals = [0] * len(column_keys)
+    for row in row_keys:
+        values = [cells.get((row, column), 0) for column in column_keys]
+        for i, value in enumerate(values):
+            column_totals[i] += value
+        table_data.append([row] + [format_duration(value) if value else "" for value in values]
+                          + [format_duration(sum(values))])
+    table_data.append(["Sum Timer"] + [format_duration(value) for value in column_totals]
+                      + [format_duration(sum(column_totals))])
+    return table_data
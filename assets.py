@@ -0,0 +1,64 @@
+import os
+import sys
+import tkinter as tk
+
+# Images for the window. Decoding the 1024 px logo.png with PIL took most of
+# the start-up time, so the scaled logo is written once as a small PNG next to
+# the original and later launches load that with Tk's own PhotoImage - no PIL
+# import at all. The thumbnail is rebuilt when logo.png is newer than it.
+
+if getattr(sys, 'frozen', False):
+    # The application is frozen (compiled to .exe)
+    APP_DIR = os.path.dirname(os.path.abspath(sys.argv[0]))
+else:
+    APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOGO = "logo.png"
+LOGO_SIZE = 250
+
+
+def asset_path(name):
+    return os.path.join(APP_DIR, name)
+
+
+def thumbnail_path(path, size):
+    base, _ = os.path.splitext(os.path.basename(path))
+    name = f"{base}_{size}.png"
+    # Next to the program when that folder is writable (not always so for an installed .exe)
+    folder = os.path.dirname(path)
+    if not os.access(folder, os.W_OK):
+        folder = os.path.join(os.path.expanduser("~"), ".worker_time_list")
+        os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, name)
+
+
+def write_thumbnail(path, target, size):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.thumbnail((size, size))
+        image.save(target + ".tmp", "PNG", optimize=True)
+    os.replace(target + ".tmp", target)
+
+
+def load_image(path, size):
+    # tk.PhotoImage of path scaled to fit size x size
+    cached = thumbnail_path(path, size)
+    try:
+        if not os.path.exists(cached) or os.path.getmtime(cached) < os.path.getmtime(path):
+            write_thumbnail(path, cached, size)
+        return tk.PhotoImage(file=cached)
+    except (ImportError, OSError, tk.TclError):
+        # No PIL or no place to write: Tk reads PNG itself, only shrinking is coarser
+        image = tk.PhotoImage(file=path)
+        factor = -(-max(image.width(), image.height()) // size)
+        return image.subsample(factor) if factor > 1 else image
+
+
+def logo(size=LOGO_SIZE):
+    # None when the program is shipped without a logo
+    path = asset_path(LOGO)
+    if not os.path.exists(path):
+        print(f"File not found: {path}")
+        return None
+    return load_image(path, size)
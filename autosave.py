@@ -0,0 +1,236 @@
+import array
+import json
+import os
+import queue
+import threading
+import time
+
+# Background autosave for sheets that have no session file (--no-session, or
+# a session that could not be opened). The Tk thread only notes each edit as a
+# small delta; from root.after, every SAVE_MS or after SAVE_EDITS edits, the
+# deltas go to a writer thread that appends them to a journal. A bulk import,
+# the first save and a long journal write a full snapshot instead (copy of the
+# columns, written to .tmp and renamed), which also starts a new journal.
+#
+#   name.snapshot   {"generation", "time", "rows", "customers"} JSON line + the six columns
+#   name.journal    {"generation"} line, then one JSON delta per line
+#
+# A journal only applies to the snapshot with the same generation, so a crash
+# between writing the two files cannot replay old deltas. A torn last line is
+# dropped on recovery.
+
+SAVE_MS = 5000
+SAVE_EDITS = 50
+COMPACT_EDITS = 5000  # journal deltas after which a snapshot is cheaper to recover
+COLUMNS = ("days", "customers", "starts", "ends", "pauses", "minutes")
+
+
+def snapshot_path(path):
+    return path + ".snapshot"
+
+
+def journal_path(path):
+    return path + ".journal"
+
+
+def _read_snapshot(path):
+    with open(snapshot_path(path), "rb") as f:
+        header = json.loads(f.readline())
+        columns = []
+        for typecode in ("i", "i", "i", "i", "b", "i"):
+            column = array.array(typecode)
+            column.fromfile(f, header["rows"])
+            columns.append(column)
+    return header, columns
+
+
+def _read_journal(path, generation):
+    try:
+        with open(journal_path(path), encoding="utf-8") as f:
+            lines = f.read().split("\n")
+    except FileNotFoundError:
+        return []
+    try:
+        if json.loads(lines[0])["generation"] != generation:
+            return []
+    except (ValueError, KeyError):
+        return []
+    deltas = []
+    for line in lines[1:]:
+        try:
+            deltas.append(json.loads(line))
+        except ValueError:
+            break  # last line was cut off by the crash
+    return deltas
+
+
+def _replayed_rows(rows, deltas):
+    # Rows after the deltas; ValueError when a delta does not fit the sheet, so
+    # the store is never left half restored
+    for delta in deltas:
+        try:
+            if delta[0] == "i" and len(delta) == 8 and 0 <= delta[1] <= rows:
+                rows += 1
+                continue
+            if delta[0] == "d" and len(delta) == 2 and 0 <= delta[1] < rows:
+                rows -= 1
+                continue
+        except (TypeError, KeyError, IndexError):
+            pass
+        raise ValueError("The autosave journal does not match its snapshot.")
+    return rows
+
+
+def find(path):
+    # (rows, saved at) of a recoverable sheet, or None
+    try:
+        header, _ = _read_snapshot(path)
+        rows = _replayed_rows(header["rows"], _read_journal(path, header["generation"]))
+    except (OSError, ValueError, KeyError, EOFError):
+        return None
+    return (rows, header["time"]) if rows > 0 else None
+
+
+def restore(path, store):
+    # Fills an empty store with the last autosaved sheet
+    header, columns = _read_snapshot(path)
+    deltas = _read_journal(path, header["generation"])
+    _replayed_rows(header["rows"], deltas)
+    for customer_id, name in enumerate(header["customers"]):
+        if store.intern_customer(name) != customer_id:
+            raise ValueError("The autosave can only be restored into an empty sheet.")
+    store.extend(*columns)
+    for delta in deltas:
+        if delta[0] == "i":
+            store.insert(*delta[1:])
+        else:
+            store.delete(delta[1])
+    return len(store)
+
+
+def discard(path):
+    for name in (snapshot_path(path), journal_path(path)):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+class Autosave:
+    def __init__(self, master, store, path, interval_ms=SAVE_MS, every=SAVE_EDITS):
+        self.master = master
+        self.store = store
+        self.path = path
+        self.interval_ms = interval_ms
+        self.every = every
+
+        self.pending = []
+        self.snapshot_needed = True
+        self.journal_edits = 0
+        self.generation = None
+        self.written = None  # generation of the last snapshot that reached the disk
+        self.failed = None  # generation of a snapshot the writer could not write
+        self.timer = None
+        self.error = None  # last write error, the sheet itself is never affected
+
+        self.jobs = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self._write_loop, name="autosave", daemon=True)
+        self.writer.start()
+        store.subscribe(self.on_change)
+
+    def on_change(self, action, index):
+        # Tk thread, right after the edit: only remember it
+        if action == "insert":
+            self.pending.append(["i", index, *self.store[index]])
+        elif action == "delete":
+            self.pending.append(["d", index])
+        else:
+            self.snapshot_needed = True
+            self.pending = []
+
+        if self.snapshot_needed or len(self.pending) >= self.every:
+            self._schedule(0)
+        else:
+            self._schedule(self.interval_ms)
+
+    def _schedule(self, delay_ms):
+        if self.timer is not None:
+            if delay_ms:
+                return
+            self.master.after_cancel(self.timer)
+        self.timer = self.master.after(delay_ms, self.flush) if delay_ms else self.master.after_idle(self.flush)
+
+    def flush(self):
+        self.timer = None
+        if self.failed is not None and self.failed == self.generation:
+            # The last snapshot did not reach the disk and its journal would not
+            # match what is there, so the next write is a snapshot again
+            self.snapshot_needed = True
+        if self.snapshot_needed or self.journal_edits + len(self.pending) > COMPACT_EDITS:
+            self.generation = time.time_ns()  # never the same as in an earlier run
+            columns = [array.array(column.typecode, column) for column in
+                       (getattr(self.store, name) for name in COLUMNS)]
+            self.jobs.put(("snapshot", self.generation, columns, list(self.store.customer_names)))
+            self.snapshot_needed = False
+            self.journal_edits = 0
+            self._schedule(self.interval_ms)  # checks that it was written, retries if not
+        elif self.pending:
+            self.jobs.put(("journal", self.generation, self.pending, None))
+            self.journal_edits += len(self.pending)
+        self.pending = []
+
+    def _write_loop(self):
+        while True:
+            kind, generation, payload, customers = self.jobs.get()
+            if kind == "stop":
+                return
+            if kind == "journal" and generation != self.written:
+                continue  # its snapshot failed, the next snapshot holds these edits
+            try:
+                if kind == "snapshot":
+                    self._write_snapshot(generation, payload, customers)
+                    self.written = generation
+                else:
+                    self._append_journal(payload)
+                self.error = None
+            except OSError as e:
+                self.error = e
+                if kind == "snapshot":
+                    self.failed = generation
+
+    def _write_snapshot(self, generation, columns, customers):
+        header = {"generation": generation, "time": time.strftime("%d-%m-%Y %H:%M"), "rows": len(columns[0]),
+                  "customers": customers}
+        target = snapshot_path(self.path)
+        with open(target + ".tmp", "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for column in columns:
+                column.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(target + ".tmp", target)
+
+        target = journal_path(self.path)
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            f.write(json.dumps({"generation": generation}) + "\n")
+        os.replace(target + ".tmp", target)
+
+    def _append_journal(self, deltas):
+        with open(journal_path(self.path), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(delta) + "\n" for delta in deltas))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self, keep=True):
+        # Writes what is left and waits for the writer. keep=False removes the
+        # files, for an empty sheet there is nothing to recover
+        if self.timer is not None:
+            self.master.after_cancel(self.timer)
+        self.flush()
+        if self.timer is not None:
+            self.master.after_cancel(self.timer)
+            self.timer = None
+        self.jobs.put(("stop", None, None, None))
+        self.writer.join()
+        if not keep:
+            discard(self.path)
@@ -0,0 +1,88 @@
+import csv
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from timesheet import TimesheetStore, parse_record, shift_table_data
+
+# One timesheet PDF per worker and period. Input rows use the v2 columns plus
+# the worker's name: Navn, Dato, Kunde/Adresse, Starttid, Sluttid, Tok pause
+# (and an optional Sluttdato)
+
+
+def period_key(day, period="month"):
+    if period is None:
+        return ""
+    d = date.fromordinal(day)
+    if period == "week":
+        year, week, _ = d.isocalendar()
+        return f"{year}-W{week:02d}"
+    return f"{d.year}-{d.month:02d}"
+
+
+def read_csv(path, delimiter=","):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.DictReader(f, delimiter=delimiter)
+
+
+def group_records(records, period="month"):
+    groups = {}
+    for line, record in enumerate(records, start=2):
+        try:
+            worker = record["Navn"]
+            shift = parse_record(record)
+        except KeyError as e:
+            raise ValueError(f"Row {line}: missing column {e}") from None
+        except ValueError as e:
+            raise ValueError(f"Row {line}: {e}") from None
+
+        key = (worker, period_key(shift.day, period))
+        store = groups.get(key)
+        if store is None:
+            store = groups[key] = TimesheetStore()
+        store.add(shift.day, shift.customer, shift.minutes, start=shift.start, end=shift.end, pause=shift.pause)
+    return groups
+
+
+def safe_filename(text):
+    return re.sub(r"[^\w.-]+", "_", text).strip("_") or "ukjent"
+
+
+def prepare_jobs(groups, output_folder):
+    jobs = []
+    for (worker, period), store in sorted(groups.items()):
+        shifts = sorted(store, key=lambda shift: (shift.day, shift.start))
+        filename = os.path.join(output_folder, f"{safe_filename(worker)}_{period}.pdf")
+        jobs.append((filename, shift_table_data(shifts, store.totals.total), f"{worker} {period}"))
+    return jobs
+
+
+def _build(job):
+    import pdf_export
+    filename, table_data, header = job
+    return pdf_export.build_pdf(filename, table_data, header)
+
+
+def export_batch(records, output_folder, period="month", workers=None, progress=None):
+    os.makedirs(output_folder, exist_ok=True)
+    jobs = prepare_jobs(group_records(records, period), output_folder)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) < 2:
+        files = []
+        for job in jobs:
+            files.append(_build(job))
+            if progress:
+                progress(len(files), len(jobs))
+        return files
+
+    # Every worker process imports pdf_export once, so the table styles are
+    # built once per process and not once per document
+    files = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for future in as_completed([executor.submit(_build, job) for job in jobs]):
+            files.append(future.result())
+            if progress:
+                progress(len(files), len(jobs))
+    return sorted(files)
@@ -0,0 +1,171 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from timesheet import parse_clock, work_minutes, format_duration
+
+# Times the main operations of both programs on synthetic sheets and writes
+# the results as JSON. Every size is run twice: once for the time, once under
+# tracemalloc for the peak memory (tracing makes the code itself slower).
+#
+#   python benchmark.py -o results.json
+#   python benchmark.py --sizes 100 10000 --compare results.json
+
+SIZES = [10 ** 2, 10 ** 4, 10 ** 6]
+EXPORT_LIMIT = 10 ** 4  # PDF / JPG above this size take minutes, use --export-limit to include them
+REGRESSION = 0.20  # --compare fails when an operation got this much slower
+MIN_SECONDS = 0.001  # faster operations are timer noise and are not compared
+CUSTOMERS = ["Storgata 1", "Parkveien 12", "Kirkegata 7", "Havnegata 3", "Torget 9", "Bryggen 21"]
+
+
+def load_program(filename, name):
+    # "worker v1.py" / "worker v2.py" are not importable by name
+    spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                      filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_shifts(size, seed=1):
+    # (DD-MM-YYYY, customer, start HH:MM, end HH:MM, pause) - a few shifts a day, a few night shifts
+    rng = random.Random(seed)
+    first = date(2020, 1, 1)
+    shifts = []
+    for i in range(size):
+        day = (first + timedelta(days=i // 3)).strftime("%d-%m-%Y")
+        start = rng.choice([6, 7, 8, 14, 22]) * 60 + rng.choice([0, 15, 30, 45])
+        end = (start + rng.randint(120, 600)) % 1440
+        shifts.append((day, rng.choice(CUSTOMERS), f"{start // 60}:{start % 60:02d}",
+                       f"{end // 60}:{end % 60:02d}", rng.random() < 0.7))
+    return shifts
+
+
+def v1_operations(module, shifts, folder):
+    table = module.WorkingHoursTable()
+    hours = [f"{(i % 40 + 10) / 4:.2f}" for i in range(len(shifts))]
+
+    def add():
+        for (day, customer, _, _, _), value in zip(shifts, hours):
+            table.add_record(day, customer, value)
+
+    pdf = os.path.join(folder, "v1.pdf")
+    return [("add", add, len(shifts)),
+            ("total", table.calculate_total_working_hours, 1),
+            ("prepare_table_data", table.prepare_table_data, 1),
+            ("pdf", lambda: table.save_table_to_pdf(pdf), 1),
+            ("jpg", lambda: table.convert_pdf_to_jpg(pdf, os.path.join(folder, "v1")), 1)]
+
+
+def v2_operations(module, shifts, folder):
+    employee = module.Ansatt()
+    rows = []
+    for day, customer, start, end, pause in shifts:
+        minutes = work_minutes(parse_clock(start), parse_clock(end), pause)
+        rows.append((day, customer, start, end, 'Ja' if pause else 'Nei', format_duration(minutes)))
+
+    def add():
+        for row in rows:
+            employee.legg_til_opptegnelse(*row)
+
+    pdf = os.path.join(folder, "v2.pdf")
+    return [("add", add, len(rows)),
+            ("total", employee.beregn_total_arbeidstid, 1),
+            ("prepare_table_data", employee.prepare_table_data, 1),
+            ("pdf", lambda: employee.zapisz_tabele_do_pdf(pdf), 1),
+            ("jpg", lambda: employee.konwertuj_pdf_do_jpg(pdf, os.path.join(folder, "v2")), 1)]
+
+
+def run(version, operations, size, export_limit, trace):
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for name, function, count in operations(folder):
+            if name in ("pdf", "jpg") and size > export_limit:
+                continue
+            os.makedirs(os.path.join(folder, version), exist_ok=True)
+            if trace:
+                tracemalloc.start()
+                function()
+                results[name] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                start = time.perf_counter()
+                function()
+                results[name] = (time.perf_counter() - start, count)
+    return results
+
+
+def benchmark(sizes, export_limit=EXPORT_LIMIT, memory=True, progress=print):
+    programs = {"v1": (load_program("worker v1.py", "worker_v1"), v1_operations),
+                "v2": (load_program("worker v2.py", "worker_v2"), v2_operations)}
+    results = []
+    for size in sizes:
+        shifts = synthetic_shifts(size)
+        for version, (module, build) in programs.items():
+            def operations(folder):
+                return build(module, shifts, folder)
+
+            times = run(version, operations, size, export_limit, trace=False)
+            peaks = run(version, operations, size, export_limit, trace=True) if memory else {}
+            for name, (seconds, count) in times.items():
+                result = {"version": version, "size": size, "operation": name, "seconds": round(seconds, 6),
+                          "per_item_us": round(seconds / count * 1e6, 3)}
+                if name in peaks:
+                    result["peak_kb"] = round(peaks[name] / 1024, 1)
+                results.append(result)
+                if progress:
+                    progress(f"{version} {size:>8} {name:<20} {seconds:10.4f} s"
+                             + (f" {result['peak_kb']:12.1f} KiB" if "peak_kb" in result else ""))
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION):
+    # Operations that got slower than the baseline by more than threshold
+    old = {(r["version"], r["size"], r["operation"]): r["seconds"] for r in baseline["results"]}
+    slower = []
+    for result in results:
+        before = old.get((result["version"], result["size"], result["operation"]))
+        if before and before >= MIN_SECONDS and result["seconds"] > before * (1 + threshold):
+            slower.append((result, before))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark of the timesheet core and the export paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="number of shifts per run")
+    parser.add_argument("--export-limit", type=int, default=EXPORT_LIMIT,
+                        help="largest size that is also exported to PDF and JPG")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    parser.add_argument("--compare", help="earlier results; exit code 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=REGRESSION)
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.sizes, args.export_limit, memory=not args.no_memory)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"python": sys.version.split()[0], "platform": platform.platform(), "cpus": os.cpu_count(),
+                   "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}, f, indent=1)
+    print(args.output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slower = compare(results, json.load(f), args.threshold)
+        for result, before in slower:
+            print(f"SLOWER: {result['version']} {result['size']} {result['operation']}: "
+                  f"{before:.4f} s -> {result['seconds']:.4f} s")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
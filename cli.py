@@ -0,0 +1,267 @@
+import argparse
+import sys
+
+from timesheet import parse_clock, parse_date, work_minutes, format_date, format_duration
+
+# Command line entry point. Runs without Tk, and reportlab / PyMuPDF are only
+# imported by the commands that write PDFs.
+
+
+def cmd_hours(args):
+    print(format_duration(work_minutes(parse_clock(args.start), parse_clock(args.end), args.pause)))
+    return 0
+
+
+def cmd_total(args):
+    from batch_export import group_records, read_csv
+
+    total = 0
+    for (worker, period), store in sorted(group_records(read_csv(args.input, args.delimiter), args.period).items()):
+        print(f"{worker}\t{period}\t{format_duration(store.totals.total)}")
+        total += store.totals.total
+    print(f"Sum Timer\t\t{format_duration(total)}")
+    return 0
+
+
+def cmd_check(args):
+    from importer import import_groups
+    import overlaps
+
+    # One store per worker: two workers on the same shift is not a duplicate
+    stores, report = import_groups(args.input, "Navn", args.delimiter)
+    print(report.summary(limit=args.limit))
+    found = 0
+    total = 0
+    for worker, store in sorted(stores.items()):
+        problems = overlaps.find_problems(store)
+        if problems:
+            found += len(problems)
+            print(f"{worker + ': ' if worker else ''}{len(problems)} duplicate or overlapping shifts:")
+            print(overlaps.summary(store, problems, limit=args.limit))
+        total += store.totals.total
+    print(f"Sum Timer\t{format_duration(total)}")
+    return 1 if report.errors or found else 0
+
+
+def cmd_query(args):
+    from query import ShiftIndex, merge_results
+
+    if args.input.lower().endswith(".db"):
+        from storage import open_session
+        from timesheet import TimesheetStore
+        stores = {"": TimesheetStore()}
+        open_session(args.input, stores[""])
+    else:
+        from batch_export import group_records, read_csv
+        stores = {worker: store for (worker, _), store in group_records(read_csv(args.input, args.delimiter),
+                                                                          period=None).items()}
+    if args.worker is not None:
+        stores = {args.worker: stores[args.worker]} if args.worker in stores else {}
+
+    first = parse_date(args.first) if args.first else None
+    last = parse_date(args.last) if args.last else None
+    results = []
+    summary = {}
+    for worker, store in sorted(stores.items()):
+        index = ShiftIndex(store)
+        results.append(index.query(first, last, args.customer))
+        for customer, minutes in index.customer_summary(first, last).items():
+            if args.customer is None or customer == args.customer:
+                summary[customer] = summary.get(customer, 0) + minutes
+    shifts, total = merge_results(results)
+
+    if not args.summary:
+        for shift in shifts:
+            print(f"{format_date(shift.day)}\t{shift.customer}\t{format_duration(shift.minutes)}")
+    for customer, minutes in sorted(summary.items()):
+        print(f"{customer}\t{format_duration(minutes)}")
+    print(f"Sum Timer\t{format_duration(total)}")
+
+    if args.pdf:
+        import pdf_export
+        header = " ".join(text for text in (args.worker, args.customer, args.first, args.last) if text)
+        print(pdf_export.build_shifts_pdf(args.pdf, shifts, total, header))
+    return 0
+
+
+def cmd_payroll(args):
+    from batch_export import group_records, read_csv
+    from durations import DurationEngine, DEFAULT_BREAKS, DEFAULT_BRACKETS
+    from query import ShiftIndex
+
+    engine = DurationEngine(breaks=args.breaks or DEFAULT_BREAKS, brackets=args.brackets or DEFAULT_BRACKETS,
+                            automatic_breaks=args.automatic_breaks)
+    first = parse_date(args.first) if args.first else None
+    last = parse_date(args.last) if args.last else None
+    groups = group_records(read_csv(args.input, args.delimiter), period=None)
+    print("\t".join(["Navn"] + engine.bracket_names))
+    for (worker, _), store in sorted(groups.items()):
+        minutes = engine.payroll(store, ShiftIndex(store).rows(first, last))
+        print("\t".join([worker] + [format_duration(value) for value in minutes.values()]))
+    return 0
+
+
+def cmd_summary(args):
+    from aggregate import aggregate, summary_table
+    from batch_export import read_csv
+
+    if args.rows == args.columns:
+        raise ValueError("--rows and --columns must be different")
+    table_data = summary_table(aggregate(read_csv(args.input, args.delimiter), args.period, args.workers),
+                               args.rows, args.columns)
+    for row in table_data:
+        print("\t".join(row))
+    if args.pdf:
+        import pdf_export
+        from reportlab.lib.pagesizes import landscape, letter
+        header = f"{args.period} x {args.columns}" if args.rows == "period" else f"{args.rows} x {args.columns}"
+        pagesize = landscape(letter) if len(table_data[0]) > 7 else letter
+        print(pdf_export.build_pdf(args.pdf, table_data, header, pagesize=pagesize))
+    return 0
+
+
+def cmd_batch(args):
+    from batch_export import export_batch, read_csv
+
+    def progress(done, total):
+        print(f"{done}/{total}", end="\r", file=sys.stderr)
+
+    files = export_batch(read_csv(args.input, args.delimiter), args.output, period=args.period,
+                         workers=args.workers, progress=None if args.quiet else progress)
+    for filename in files:
+        print(filename)
+    return 0
+
+
+def cmd_extract(args):
+    import pdf_import
+    from storage import default_session_path
+
+    def progress(done, total):
+        print(f"{done}/{total}", end="\r", file=sys.stderr)
+
+    files = pdf_import.find_pdfs(args.inputs)
+    cache_path = None if args.no_cache else args.cache or default_session_path("pdf_tables.json")
+    cache = pdf_import.load_cache(cache_path) if cache_path else None
+    results, errors = pdf_import.extract_files(files, cache, args.workers, None if args.quiet else progress)
+    if cache_path:
+        pdf_import.save_cache(cache, cache_path)
+
+    if args.output == "-":
+        rows = pdf_import.write_csv(results, sys.stdout)
+    else:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            rows = pdf_import.write_csv(results, f)
+    for path, message in sorted(errors.items()):
+        print(f"{path}: {message}", file=sys.stderr)
+    bad_rows = 0
+    for path, table in sorted(results.items()):
+        for error in table["errors"]:
+            print(f"{path}: page {error['page']}: {error['text']}: {error['message']}", file=sys.stderr)
+            bad_rows += 1
+    print(f"{rows} shifts from {len(results)} of {len(files)} PDF files", file=sys.stderr)
+    if bad_rows:
+        print(f"{bad_rows} table rows could not be read", file=sys.stderr)
+    return 1 if errors or bad_rows else 0
+
+
+def parse_break(text):
+    from durations import parse_break
+    return parse_break(text)
+
+
+def parse_bracket(text):
+    from durations import parse_bracket
+    return parse_bracket(text)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Worker time list generator without the GUI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    hours = commands.add_parser("hours", help="working time for one shift")
+    hours.add_argument("start", help="HH:MM")
+    hours.add_argument("end", help="HH:MM")
+    hours.add_argument("--pause", action="store_true", help="took the 30 minute break")
+    hours.set_defaults(func=cmd_hours)
+
+    total = commands.add_parser("total", help="total working time per worker and period from a CSV file")
+    total.add_argument("input", help="CSV with columns Navn, Dato, Kunde/Adresse, Starttid, Sluttid, Tok pause")
+    total.add_argument("--period", choices=["month", "week"], default="month")
+    total.add_argument("-d", "--delimiter", default=",")
+    total.set_defaults(func=cmd_total)
+
+    check = commands.add_parser("check", help="validate a CSV / JSON Lines export and list all bad, duplicate and overlapping rows")
+    check.add_argument("input")
+    check.add_argument("-d", "--delimiter", default=",")
+    check.add_argument("--limit", type=int, default=50, help="number of bad rows to list")
+    check.set_defaults(func=cmd_check)
+
+    query = commands.add_parser("query", help="shifts in a date range, per customer and / or worker")
+    query.add_argument("input", help="CSV like for total, or a session file (.db)")
+    query.add_argument("--from", dest="first", help="DD-MM-YYYY")
+    query.add_argument("--to", dest="last", help="DD-MM-YYYY")
+    query.add_argument("--customer")
+    query.add_argument("--worker")
+    query.add_argument("--summary", action="store_true", help="only the hours per customer")
+    query.add_argument("--pdf", help="also write the result as a PDF timesheet")
+    query.add_argument("-d", "--delimiter", default=",")
+    query.set_defaults(func=cmd_query)
+
+    payroll = commands.add_parser("payroll", help="hours per worker split into normal time and overtime")
+    payroll.add_argument("input", help="CSV like for total")
+    payroll.add_argument("--from", dest="first", help="DD-MM-YYYY")
+    payroll.add_argument("--to", dest="last", help="DD-MM-YYYY")
+    payroll.add_argument("--break", dest="breaks", action="append", type=parse_break, metavar="LENGTH:MINUTES",
+                         help="break for shifts of at least LENGTH minutes, repeat for more rules (default 0:30)")
+    payroll.add_argument("--automatic-breaks", action="store_true", help="apply the break rules to every shift")
+    payroll.add_argument("--bracket", dest="brackets", action="append", type=parse_bracket, metavar="MINUTES:NAME",
+                         help="overtime bracket from MINUTES worked per day (default 0:Normal 450:'Overtid 50%%' "
+                              "600:'Overtid 100%%')")
+    payroll.add_argument("-d", "--delimiter", default=",")
+    payroll.set_defaults(func=cmd_payroll)
+
+    summary = commands.add_parser("summary", help="hours grouped by period, worker and / or site (Kunde/Adresse)")
+    summary.add_argument("input", help="CSV like for total")
+    summary.add_argument("--rows", choices=["period", "worker", "site"], default="period")
+    summary.add_argument("--columns", choices=["period", "worker", "site"], default="worker")
+    summary.add_argument("--period", choices=["month", "week"], default="month")
+    summary.add_argument("-j", "--workers", type=int, help="number of processes (default: all CPUs)")
+    summary.add_argument("--pdf", help="also write the table as a PDF")
+    summary.add_argument("-d", "--delimiter", default=",")
+    summary.set_defaults(func=cmd_summary)
+
+    batch = commands.add_parser("batch", help="one PDF per worker and period from a CSV file")
+    batch.add_argument("input", help="CSV with columns Navn, Dato, Kunde/Adresse, Starttid, Sluttid, Tok pause")
+    batch.add_argument("-o", "--output", default=".", help="folder for the PDF files")
+    batch.add_argument("--period", choices=["month", "week"], default="month")
+    batch.add_argument("-j", "--workers", type=int, help="number of processes (default: all CPUs)")
+    batch.add_argument("-d", "--delimiter", default=",")
+    batch.add_argument("-q", "--quiet", action="store_true")
+    batch.set_defaults(func=cmd_batch)
+
+    extract = commands.add_parser("extract", help="read the shift tables back out of timesheet PDFs into one CSV")
+    extract.add_argument("inputs", nargs="+", help="PDF files and / or folders (searched recursively)")
+    extract.add_argument("-o", "--output", default="-", help="CSV file (default: standard output)")
+    extract.add_argument("-j", "--workers", type=int, help="number of processes (default: all CPUs)")
+    extract.add_argument("--cache", help="cache file (default: ~/.worker_time_list/pdf_tables.json)")
+    extract.add_argument("--no-cache", action="store_true", help="read every file again")
+    extract.add_argument("-q", "--quiet", action="store_true")
+    extract.set_defaults(func=cmd_extract)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import numpy as np
+
+from timesheet import NO_TIME, PAUSE_MINUTES, MINUTES_PER_DAY
+
+# Working time for whole columns of shifts at once. Start and end are minutes
+# from midnight of the shift's day; an end before the start is on the next
+# day, and ends of multi-day shifts are already past 24:00 in the store.
+#
+# Break rules: ((shift length from, break minutes), ...), the last rule whose
+# length is reached applies. Only shifts with "Tok pause" get a break unless
+# automatic_breaks is set.
+# Overtime brackets: ((worked minutes per day from, name), ...), every day's
+# time is split over the brackets. Without a bracket from 0 a "Normal" one is
+# added, so every worked minute lands in some bracket.
+
+DEFAULT_BREAKS = ((0, PAUSE_MINUTES),)
+DEFAULT_BRACKETS = ((0, "Normal"), (450, "Overtid 50%"), (600, "Overtid 100%"))
+
+
+def _split_rule(text, value_name):
+    threshold, _, value = text.partition(":")
+    try:
+        threshold = int(threshold)
+    except ValueError:
+        raise ValueError(f"Invalid rule {text!r}, use MINUTES:{value_name}") from None
+    if not value or threshold < 0:
+        raise ValueError(f"Invalid rule {text!r}, use MINUTES:{value_name}")
+    return threshold, value
+
+
+def parse_break(text):
+    # "360:30" -> (360, 30) for --break
+    length, minutes = _split_rule(text, "MINUTES")
+    if not minutes.isdigit():
+        raise ValueError(f"Invalid rule {text!r}, use MINUTES:MINUTES")
+    return length, int(minutes)
+
+
+def parse_bracket(text):
+    # "450:Overtid 50%" -> (450, "Overtid 50%") for --bracket; the name stays text, also "450:50"
+    return _split_rule(text, "NAME")
+
+
+class DurationEngine:
+    def __init__(self, breaks=DEFAULT_BREAKS, brackets=DEFAULT_BRACKETS, automatic_breaks=False):
+        breaks = sorted(breaks)
+        self.break_from = np.array([length for length, _ in breaks], dtype=np.int64)
+        self.break_minutes = np.array([minutes for _, minutes in breaks], dtype=np.int64)
+        brackets = sorted(brackets)
+        if not brackets or brackets[0][0] > 0:
+            # Time below the first given bracket is normal time, not dropped
+            brackets.insert(0, DEFAULT_BRACKETS[0])
+        names = [name for _, name in brackets]
+        if len(set(names)) < len(names):
+            raise ValueError(f"Overtime bracket names must be different: {', '.join(map(str, names))}")
+        self.bracket_from = np.array([minutes for minutes, _ in brackets], dtype=np.int64)
+        self.bracket_names = names
+        self.automatic_breaks = automatic_breaks
+
+    def spans(self, starts, ends):
+        starts, ends = np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+        return np.where(ends < starts, ends + MINUTES_PER_DAY, ends) - starts
+
+    def breaks(self, spans, pauses):
+        rule = np.searchsorted(self.break_from, spans, side="right") - 1
+        minutes = np.where(rule >= 0, self.break_minutes[np.maximum(rule, 0)], 0)
+        if not self.automatic_breaks:
+            minutes = np.where(np.asarray(pauses, dtype=bool), minutes, 0)
+        return minutes
+
+    def work(self, starts, ends, pauses, minutes=None):
+        # Worked minutes per shift; rows without times (v1) keep their stored minutes
+        spans = self.spans(starts, ends)
+        worked = spans - self.breaks(spans, pauses)
+        if minutes is not None:
+            worked = np.where(np.asarray(starts) == NO_TIME, np.asarray(minutes, dtype=np.int64), worked)
+        return worked
+
+    def split_brackets(self, days, worked):
+        # (days, minutes per day and bracket as a (days, brackets) matrix)
+        unique_days, day_index = np.unique(np.asarray(days, dtype=np.int64), return_inverse=True)
+        per_day = np.bincount(day_index, weights=worked, minlength=len(unique_days)).astype(np.int64)
+        upper = np.append(self.bracket_from[1:], np.iinfo(np.int64).max)
+        matrix = np.clip(per_day[:, None], self.bracket_from, upper) - self.bracket_from
+        return unique_days, matrix
+
+    def payroll(self, store, rows=None):
+        # {bracket name: minutes} for a TimesheetStore, or only the given rows (e.g. a query result)
+        columns = [np.frombuffer(column, dtype=np.int8 if column.typecode == "b" else np.int32)
+                   for column in (store.days, store.starts, store.ends, store.pauses, store.minutes)]
+        if rows is not None:
+            rows = np.frombuffer(rows, dtype=np.int32) if hasattr(rows, "typecode") else np.asarray(rows)
+            columns = [column[rows] for column in columns]
+        days, starts, ends, pauses, minutes = columns
+        if not len(days):
+            return dict.fromkeys(self.bracket_names, 0)
+        _, matrix = self.split_brackets(days, self.work(starts, ends, pauses, minutes))
+        return dict(zip(self.bracket_names, matrix.sum(axis=0).tolist()))
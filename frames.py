@@ -0,0 +1,75 @@
+import tkinter as tk
+
+# Coalescing of UI work on the Tk event loop. Work requested many times before
+# the next frame (a total label after every row of an import, a refill of the
+# virtual table after every scroll step) runs once, and window resizes run once
+# after the window has stopped changing size for a moment.
+
+FRAME_MS = 16  # ~60 updates per second at most
+RESIZE_DEBOUNCE_MS = 80
+
+
+class FrameScheduler:
+    def __init__(self, master, frame_ms=FRAME_MS):
+        self.master = master
+        self.frame_ms = frame_ms
+        self.pending = {}  # key -> callback, a newer request replaces the older one
+        self.frame = None
+        self.timers = {}
+
+    def request(self, key, callback):
+        # Runs callback once in the next frame, however often it is requested until then
+        self.pending[key] = callback
+        if self.frame is None:
+            self.frame = self.master.after(self.frame_ms, self.flush)
+
+    def debounce(self, key, callback, delay_ms=RESIZE_DEBOUNCE_MS):
+        # Runs callback (in a frame) once no new request came for delay_ms
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            self.master.after_cancel(timer)
+        self.timers[key] = self.master.after(delay_ms, self._debounced, key, callback)
+
+    def _debounced(self, key, callback):
+        self.timers.pop(key, None)
+        self.request(key, callback)
+
+    def flush(self):
+        self.frame = None
+        pending, self.pending = self.pending, {}
+        for callback in pending.values():
+            callback()
+
+
+def fit_columns(tree, weights):
+    # Column widths from fixed weights, so repeated resizes cannot drift.
+    # The rounding rest goes to the last column.
+    width = tree.winfo_width()
+    if width <= 1:
+        return
+    columns = tree["columns"]
+    total = sum(weights)
+    widths = [width * weight // total for weight in weights]
+    widths[-1] += width - sum(widths)
+    for column, column_width in zip(columns, widths):
+        tree.column(column, width=column_width)
+
+
+class StatusBar(tk.Label):
+    # One line at the bottom of the window instead of a message box per row
+    COLORS = {"info": "gray25", "ok": "dark green", "warning": "dark orange", "error": "red"}
+
+    def __init__(self, master, timeout_ms=6000, **options):
+        super().__init__(master, text="", anchor="w", font=("Arial", 10), bd=1, relief=tk.SUNKEN, **options)
+        self.timeout_ms = timeout_ms
+        self.timer = None
+
+    def show(self, text, kind="info"):
+        self.config(text=text, fg=self.COLORS[kind])
+        if self.timer is not None:
+            self.after_cancel(self.timer)
+        self.timer = self.after(self.timeout_ms, self.clear)
+
+    def clear(self):
+        self.timer = None
+        self.config(text="")
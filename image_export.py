@@ -0,0 +1,66 @@
+import os
+
+import fitz  # PyMuPDF
+
+import metrics
+import pdf_export
+
+# Timesheet -> PNG / JPEG / WebP without writing a PDF file: the pages are
+# built in memory (through the same page cache as the PDF export) and every
+# page is rasterized straight from that document. Thumbnails are rendered
+# from the page itself at a smaller scale, not by shrinking the full image.
+
+FORMATS = {".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg", ".webp": "webp"}
+THUMBNAIL_WIDTH = 200  # pixels
+
+
+def encode(pixmap, image_format, quality=95):
+    if image_format == "png":
+        return pixmap.tobytes("png")
+    if image_format == "jpeg":
+        try:
+            return pixmap.tobytes("jpeg", jpg_quality=quality)
+        except (TypeError, ValueError):
+            pass  # older PyMuPDF, Pillow below
+    import io
+    from PIL import Image
+    image = Image.frombytes("RGB", [pixmap.width, pixmap.height], pixmap.samples)
+    buffer = io.BytesIO()
+    image.save(buffer, image_format.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def render_images(document, image_format="png", dpi=72, quality=95, thumbnail_width=None, progress=None):
+    # Yields (page number, image bytes, thumbnail bytes or None) for every page
+    for number, page in enumerate(document):
+        with metrics.span("image_page"):
+            image = encode(page.get_pixmap(dpi=dpi, alpha=False), image_format, quality)
+            thumbnail = None
+            if thumbnail_width:
+                scale = thumbnail_width / page.rect.width
+                thumbnail = encode(page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False), image_format,
+                                   quality)
+        yield number, image, thumbnail
+        if progress:
+            progress(number + 1, document.page_count)
+
+
+def export_images(filename, table_data, header="", cache=None, header_rows=1, dpi=72, quality=95,
+                  thumbnails=True, progress=None):
+    # timesheet.png -> timesheet_1.png, timesheet_1_thumb.png, timesheet_2.png, ...
+    base, extension = os.path.splitext(filename)
+    image_format = FORMATS.get(extension.lower())
+    if image_format is None:
+        raise ValueError(f"Unknown image type {extension!r}, use {', '.join(FORMATS)}")
+
+    files = []
+    with pdf_export.build_document(table_data, header, cache, header_rows) as document:
+        for number, image, thumbnail in render_images(document, image_format, dpi, quality,
+                                                      THUMBNAIL_WIDTH if thumbnails else None, progress):
+            for path, data in ((f"{base}_{number + 1}{extension}", image),
+                               (f"{base}_{number + 1}_thumb{extension}", thumbnail)):
+                if data is not None:
+                    with open(path, "wb") as f:
+                        f.write(data)
+                    files.append(path)
+    return files
@@ -0,0 +1,279 @@
+import array
+import csv
+import json
+from collections import namedtuple
+
+import numpy as np
+
+from timesheet import (PAUSE_MINUTES, NO_TIME, MINUTES_PER_DAY, YES, TimesheetStore, parse_date, parse_clock,
+                       parse_hours, shift_end_on)
+
+# Streaming import of shift records from CSV, JSON Lines or a timesheet PDF. Rows are read in
+# batches and every column of a batch is validated with NumPy at once; only
+# rows that fail the fast path are looked at one by one, to produce a message.
+#
+# v2 layout: Dato, Kunde/Adresse, Starttid, Sluttid, Tok pause (+ optional Sluttdato for multi-day shifts)
+# v1 layout: Dato, Kunde/Adresse, Arbeidstid (decimal hours)
+
+BATCH_SIZE = 50000
+EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+ShiftBatch = namedtuple("ShiftBatch", ["days", "customer_names", "customer_codes", "starts", "ends", "pauses",
+                                       "minutes"])
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.errors = []  # (line, message)
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    def summary(self, limit=20):
+        text = f"{self.imported} of {self.rows} rows imported."
+        if self.errors:
+            lines = [f"Line {line}: {message}" for line, message in sorted(self.errors)[:limit]]
+            if len(self.errors) > limit:
+                lines.append(f"... and {len(self.errors) - limit} more")
+            text += f"\n{self.rows - self.imported} rows with errors:\n" + "\n".join(lines)
+        return text
+
+
+def read_records(path, delimiter=","):
+    # Yields (line number, dict or None for a line that is not valid JSON)
+    if path.lower().endswith(".pdf"):
+        # A PDF written by the programs, the line number is the table row
+        from pdf_import import read_records as read_pdf
+        yield from read_pdf(path)
+    elif path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = None
+                    yield line_number, record if isinstance(record, dict) else None
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f, delimiter=delimiter)
+            for record in reader:
+                yield reader.line_num, record
+
+
+def _column(records, key):
+    return np.array(["" if record is None or record.get(key) is None else str(record[key]).strip()
+                     for record in records], dtype=str)
+
+
+def _digit_codes(text, width):
+    # (rows, width) matrix of the characters as numbers, '0'..'9' -> 0..9
+    fixed = np.asarray(text, dtype=f"U{width}")
+    return fixed.view(np.uint32).reshape(len(fixed), width).astype(np.int64) - 48
+
+
+def _number(codes, columns):
+    value = np.zeros(len(codes), dtype=np.int64)
+    ok = np.ones(len(codes), dtype=bool)
+    for column in columns:
+        digit = codes[:, column]
+        ok &= (digit >= 0) & (digit <= 9)
+        value = value * 10 + digit
+    return value, ok
+
+
+def _fallback(values, ok, result, parse):
+    # Rows the vectorized path rejected get a second chance through the
+    # scalar parser (e.g. "1-2-2024"), which also supplies the error text
+    errors = {}
+    for i in np.flatnonzero(~ok):
+        try:
+            result[i] = parse(values[i])
+            ok[i] = True
+        except ValueError as e:
+            errors[i] = str(e)
+    return errors
+
+
+def parse_dates(values):
+    # DD-MM-YYYY -> ordinal day numbers
+    codes = _digit_codes(values, 10)
+    day, ok_day = _number(codes, (0, 1))
+    month, ok_month = _number(codes, (3, 4))
+    year, ok_year = _number(codes, (6, 7, 8, 9))
+    ok = (ok_day & ok_month & ok_year & (np.char.str_len(values) == 10)
+          & (codes[:, 2] == ord("-") - 48) & (codes[:, 5] == ord("-") - 48))
+
+    ok &= (month >= 1) & (month <= 12) & (year >= 1) & (day >= 1)
+    month_days = np.array([31, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[np.where(ok, month, 0)]
+    leap = ((year % 4 == 0) & (year % 100 != 0)) | (year % 400 == 0)
+    ok &= day <= month_days + ((month == 2) & leap)
+
+    safe_year = np.where(ok, year, 1970)
+    dates = ((safe_year - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+             + (np.where(ok, month, 1) - 1).astype("timedelta64[M]")).astype("datetime64[D]")
+    dates = dates + (np.where(ok, day, 1) - 1).astype("timedelta64[D]")
+    ordinals = dates.astype(np.int64) + EPOCH_ORDINAL
+
+    errors = _fallback(values, ok, ordinals, parse_date)
+    return ordinals, ok, errors
+
+
+def parse_clocks(values):
+    # H:MM or HH:MM -> minutes after midnight
+    padded = np.char.rjust(values, 5, "0")
+    codes = _digit_codes(padded, 5)
+    hours, ok_hours = _number(codes, (0, 1))
+    minutes, ok_minutes = _number(codes, (3, 4))
+    lengths = np.char.str_len(values)
+    ok = (ok_hours & ok_minutes & (codes[:, 2] == ord(":") - 48) & (lengths >= 4) & (lengths <= 5)
+          & (hours < 24) & (minutes < 60))
+    result = hours * 60 + minutes
+
+    errors = _fallback(values, ok, result, parse_clock)
+    return result, ok, errors
+
+
+def parse_hour_values(values):
+    # Decimal hours (v1) -> minutes, exact like parse_hours. A sheet has few
+    # distinct values ("7.5", "8"), so each one is parsed once and spread back
+    unique, inverse = np.unique(values, return_inverse=True)
+    parsed = np.zeros(len(unique), dtype=np.int64)
+    valid = np.zeros(len(unique), dtype=bool)
+    errors = _fallback(unique.tolist(), valid, parsed, parse_hours)
+    ok = valid[inverse]
+    return parsed[inverse], ok, {i: errors[inverse[i]] for i in np.flatnonzero(~ok)}
+
+
+def parse_batch(lines, records, report):
+    n = len(records)
+    ok = np.array([record is not None for record in records], dtype=bool)
+    for i in np.flatnonzero(~ok):
+        report.error(lines[i], "Not a valid record")
+
+    problems = []
+    days, ok_days, errors = parse_dates(_column(records, "Dato"))
+    ok &= ok_days
+    problems.append(("Dato", errors))
+
+    first = next((record for record in records if record is not None), {})
+    if "Starttid" in first or "Arbeidstid" not in first:
+        starts, ok_starts, errors = parse_clocks(_column(records, "Starttid"))
+        problems.append(("Starttid", errors))
+        ends, ok_ends, errors = parse_clocks(_column(records, "Sluttid"))
+        problems.append(("Sluttid", errors))
+        ok &= ok_starts & ok_ends
+
+        # End times are stored as minutes from the start day: night shifts end the next day
+        clock_ends = ends
+        ends = np.where(ends < starts, ends + MINUTES_PER_DAY, ends)
+        if "Sluttdato" in first:
+            # The few multi-day rows go through the same rule as timesheet.parse_record
+            end_dates = _column(records, "Sluttdato")
+            errors = {}
+            for i in np.flatnonzero(ok & (end_dates != "")):
+                try:
+                    ends[i] = shift_end_on(int(days[i]), int(starts[i]), int(clock_ends[i]), parse_date(end_dates[i]))
+                except ValueError as e:
+                    ok[i] = False
+                    errors[i] = str(e)
+            problems.append(("Sluttdato", errors))
+
+        pauses = np.isin(np.char.lower(_column(records, "Tok pause")), YES)
+        minutes = ends - starts - PAUSE_MINUTES * pauses
+    else:
+        minutes, ok_minutes, errors = parse_hour_values(_column(records, "Arbeidstid"))
+        problems.append(("Arbeidstid", errors))
+        ok &= ok_minutes
+        starts = ends = np.full(n, NO_TIME, dtype=np.int64)
+        pauses = np.zeros(n, dtype=bool)
+
+    for field, errors in problems:
+        for i, message in errors.items():
+            if records[i] is not None:
+                report.error(lines[i], f"{field}: {message}")
+
+    customers = _column(records, "Kunde/Adresse")[ok]
+    names, codes = np.unique(customers, return_inverse=True)
+    report.rows += n
+    report.imported += int(ok.sum())
+    return ShiftBatch(days[ok], names, codes, starts[ok], ends[ok], pauses[ok], minutes[ok])
+
+
+def iter_batches(path, report, delimiter=",", batch_size=BATCH_SIZE):
+    lines, records = [], []
+    for line, record in read_records(path, delimiter):
+        lines.append(line)
+        records.append(record)
+        if len(records) >= batch_size:
+            yield parse_batch(lines, records, report)
+            lines, records = [], []
+    if records:
+        yield parse_batch(lines, records, report)
+
+
+def _column_array(values, typecode):
+    return array.array(typecode, np.ascontiguousarray(values, dtype=np.int32 if typecode == "i" else np.int8)
+                       .tobytes())
+
+
+def apply_batch(store, batch):
+    # Must run on the thread that owns the store (the Tk thread in the apps)
+    if not len(batch.days):
+        return
+    lookup = np.array([store.intern_customer(str(name)) for name in batch.customer_names], dtype=np.int64)
+    customer_ids = lookup[batch.customer_codes]
+
+    unique_days, day_index = np.unique(batch.days, return_inverse=True)
+    day_sums = np.bincount(day_index, weights=batch.minutes).astype(np.int64)
+    unique_customers, customer_index = np.unique(customer_ids, return_inverse=True)
+    customer_sums = np.bincount(customer_index, weights=batch.minutes).astype(np.int64)
+
+    store.extend(_column_array(batch.days, "i"), _column_array(customer_ids, "i"),
+                 _column_array(batch.starts, "i"), _column_array(batch.ends, "i"),
+                 _column_array(batch.pauses, "b"), _column_array(batch.minutes, "i"),
+                 day_sums=dict(zip(unique_days.tolist(), day_sums.tolist())),
+                 customer_sums=dict(zip(unique_customers.tolist(), customer_sums.tolist())))
+
+
+def read_file(path, delimiter=",", batch_size=BATCH_SIZE, progress=None):
+    # Parsing half of an import, safe to run on a worker thread
+    report = ImportReport()
+    batches = []
+    for batch in iter_batches(path, report, delimiter, batch_size):
+        batches.append(batch)
+        if progress:
+            progress(report.rows)
+    return batches, report
+
+
+def import_file(store, path, delimiter=",", batch_size=BATCH_SIZE):
+    report = ImportReport()
+    for batch in iter_batches(path, report, delimiter, batch_size):
+        apply_batch(store, batch)
+    return report
+
+
+def import_groups(path, column="Navn", delimiter=",", batch_size=BATCH_SIZE):
+    # ({value of column: store}, report), e.g. one store per worker. Rows
+    # without the column (or a file without it) end up under ""
+    report = ImportReport()
+    stores = {}
+    pending = {}
+
+    def flush(key):
+        lines, records = pending.pop(key)
+        apply_batch(stores.setdefault(key, TimesheetStore()), parse_batch(lines, records, report))
+
+    for line, record in read_records(path, delimiter):
+        key = (record.get(column) or "") if record is not None else ""
+        lines, records = pending.setdefault(key, ([], []))
+        lines.append(line)
+        records.append(record)
+        if len(records) >= batch_size:
+            flush(key)
+    for key in list(pending):
+        flush(key)
+    return stores, report
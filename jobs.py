@@ -0,0 +1,114 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs slow exports off the Tk thread. Workers never touch widgets: they put
+# events on a queue and the Tk thread drains it from root.after.
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, name, events, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        self.name = name
+        self.events = events
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.cancelled = threading.Event()
+        self.future = None
+
+    def report(self, done, total=None):
+        # Passed to the job function as progress=; also the cancellation point
+        if self.cancelled.is_set():
+            raise JobCancelled(self.name)
+        self.events.put(("progress", self, (done, total)))
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+
+class JobScheduler:
+    def __init__(self, master, max_workers=2, poll_ms=50):
+        self.master = master
+        self.max_workers = max_workers
+        self.poll_ms = poll_ms
+        self.threads = ThreadPoolExecutor(max_workers=max_workers)
+        self.processes = None
+        self.events = queue.SimpleQueue()
+        self.jobs = []
+        self._polling = False
+
+    def submit(self, name, function, *args, process=False, on_done=None, on_error=None,
+               on_progress=None, on_cancel=None):
+        job = Job(name, self.events, on_done, on_error, on_progress, on_cancel)
+        if process:
+            # Progress callbacks cannot cross the process boundary, only the result comes back
+            if self.processes is None:
+                from concurrent.futures import ProcessPoolExecutor  # multiprocessing only loads when needed
+                self.processes = ProcessPoolExecutor(max_workers=self.max_workers)
+            job.future = self.processes.submit(function, *args)
+        else:
+            job.future = self.threads.submit(function, *args, progress=job.report)
+        job.future.add_done_callback(lambda future: self.events.put(("finished", job, None)))
+        self.jobs.append(job)
+
+        if not self._polling:
+            self._polling = True
+            self.master.after(self.poll_ms, self._poll)
+        return job
+
+    def running(self):
+        return [job for job in self.jobs if not job.done()]
+
+    def cancel_all(self):
+        for job in self.jobs:
+            job.cancel()
+
+    def _poll(self):
+        while True:
+            try:
+                kind, job, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                if job.on_progress and not job.cancelled.is_set():
+                    job.on_progress(job, *payload)
+            else:
+                self._finish(job)
+
+        if self.jobs:
+            self.master.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def _finish(self, job):
+        self.jobs.remove(job)
+        future = job.future
+        if future.cancelled():
+            error = JobCancelled(job.name)
+        else:
+            error = future.exception()
+
+        if isinstance(error, JobCancelled):
+            if job.on_cancel:
+                job.on_cancel(job)
+        elif error is not None:
+            if job.on_error:
+                job.on_error(job, error)
+        elif job.on_done:
+            job.on_done(job, future.result())
+
+    def shutdown(self):
+        self.cancel_all()
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        if self.processes is not None:
+            self.processes.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+# Opt-in timing instrumentation. Nothing is recorded until enable() is called,
+# and span() is then a cheap no-op context manager, so the calls can stay in
+# the hot paths.
+#
+#   with metrics.span("pdf"):
+#       ...
+#   metrics.count("import.rows", 5000)
+#
+# Every operation keeps a histogram over fixed latency buckets plus its last
+# WINDOW durations (for percentiles), and the last RECENT spans of all
+# operations are kept to list the slowest ones in the debug panel.
+
+BUCKETS = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60]  # seconds, upper bounds
+WINDOW = 1000
+RECENT = 500
+
+enabled = False
+_lock = threading.Lock()
+_operations = {}
+_counters = {}
+_recent = deque(maxlen=RECENT)
+
+
+class Operation:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last one is "more than BUCKETS[-1]"
+        self.window = deque(maxlen=WINDOW)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.window.append(seconds)
+
+    def percentile(self, fraction):
+        if not self.window:
+            return 0.0
+        values = sorted(self.window)
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def configure(argv):
+    # --metrics turns recording on, --metrics-port PORT also serves the text format
+    if "--metrics" not in argv and "--metrics-port" not in argv:
+        return False
+    enable()
+    if "--metrics-port" in argv[:-1]:
+        serve(int(argv[argv.index("--metrics-port") + 1]))
+    return True
+
+
+def reset():
+    with _lock:
+        _operations.clear()
+        _counters.clear()
+        _recent.clear()
+
+
+def record(name, seconds):
+    if not enabled:
+        return
+    with _lock:
+        operation = _operations.get(name)
+        if operation is None:
+            operation = _operations[name] = Operation()
+        operation.add(seconds)
+        _recent.append((seconds, name, time.time()))
+
+
+def count(name, n=1):
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    return _Span(name) if enabled else _NO_SPAN
+
+
+def slowest(limit=20):
+    # [(seconds, name, unix time)] of the slowest recent spans
+    with _lock:
+        return sorted(_recent, reverse=True)[:limit]
+
+
+def snapshot():
+    with _lock:
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "counters": dict(_counters),
+            "operations": {name: {"count": op.count, "total_seconds": round(op.total, 6),
+                                  "p50": round(op.percentile(0.5), 6), "p95": round(op.percentile(0.95), 6),
+                                  "max": round(max(op.window, default=0.0), 6),
+                                  "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], op.buckets))}
+                           for name, op in _operations.items()},
+        }
+
+
+def write(path):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=1)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def text():
+    # Prometheus text format, for the endpoint below or a log file
+    lines = []
+    with _lock:
+        for name, value in sorted(_counters.items()):
+            lines.append(f'worker_counter_total{{name="{name}"}} {value}')
+        for name, op in sorted(_operations.items()):
+            cumulative = 0
+            for bound, n in zip([str(b) for b in BUCKETS] + ["+Inf"], op.buckets):
+                cumulative += n
+                lines.append(f'worker_span_seconds_bucket{{name="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'worker_span_seconds_sum{{name="{name}"}} {op.total:.6f}')
+            lines.append(f'worker_span_seconds_count{{name="{name}"}} {op.count}')
+    return "\n".join(lines) + "\n"
+
+
+def serve(port, host="127.0.0.1"):
+    # http://127.0.0.1:port/metrics on a daemon thread
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def open_panel(master, refresh_ms=1000):
+    # Debug window with the slowest recent operations, refreshed while it is open
+    import tkinter as tk
+    from tkinter import ttk
+
+    window = tk.Toplevel(master)
+    window.title("Metrics")
+    tree = ttk.Treeview(window, columns=("ms", "name", "time"), show="headings", height=20)
+    for column, title, width in (("ms", "ms", 90), ("name", "Operation", 220), ("time", "When", 90)):
+        tree.heading(column, text=title)
+        tree.column(column, width=width)
+    tree.pack(fill=tk.BOTH, expand=True)
+    summary = tk.Label(window, justify=tk.LEFT, anchor="w", font=("Courier", 9))
+    summary.pack(fill=tk.X)
+
+    def refresh():
+        try:
+            if not window.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        tree.delete(*tree.get_children())
+        for seconds, name, when in slowest():
+            tree.insert("", tk.END, values=(f"{seconds * 1000:.1f}", name, time.strftime("%H:%M:%S",
+                                                                                       time.localtime(when))))
+        operations = snapshot()["operations"]
+        summary.config(text="\n".join(f"{name:<20} n={op['count']:<6} p50={op['p50'] * 1000:8.1f} ms "
+                                      f"p95={op['p95'] * 1000:8.1f} ms" for name, op in sorted(operations.items())))
+        window.after(refresh_ms, refresh)
+
+    refresh()
+    return window
@@ -0,0 +1,90 @@
+from collections import namedtuple
+
+from timesheet import NO_TIME, MINUTES_PER_DAY, format_date, format_clock
+
+# Finds shifts that cannot all be right: the same shift entered twice,
+# shifts of one day that overlap in time, and an end time before the start.
+# The whole sheet is checked with one sort by (day, start) and a sweep that
+# remembers the latest end seen so far, O(n log n). A single new shift is
+# checked against the shifts of its own and the day before through a ShiftIndex.
+
+DUPLICATE = "duplicate"
+OVERLAP = "overlap"
+END_BEFORE_START = "end before start"
+
+RELATION = {DUPLICATE: "duplicate of", OVERLAP: "overlaps"}
+
+Problem = namedtuple("Problem", ["kind", "row", "other"])  # other is None for END_BEFORE_START
+
+
+def _key(store, row):
+    return (store.days[row], store.starts[row], store.ends[row], store.customers[row], store.pauses[row],
+            store.minutes[row])
+
+
+def find_problems(store):
+    days, starts, ends = store.days, store.starts, store.ends
+    order = sorted(range(len(store)), key=lambda row: _key(store, row))
+
+    problems = []
+    previous = latest = None
+    latest_end = NO_TIME  # in minutes since day 0, so night shifts reach into the next day
+    for row in order:
+        if starts[row] != NO_TIME and ends[row] < starts[row]:
+            problems.append(Problem(END_BEFORE_START, row, None))
+            continue
+
+        if previous is not None and _key(store, previous) == _key(store, row):
+            problems.append(Problem(DUPLICATE, row, previous))
+        elif starts[row] != NO_TIME:
+            midnight = days[row] * MINUTES_PER_DAY
+            if latest is not None and midnight + starts[row] < latest_end:
+                problems.append(Problem(OVERLAP, row, latest))
+            if midnight + ends[row] > latest_end:
+                latest, latest_end = row, midnight + ends[row]
+        previous = row
+    return problems
+
+
+def check_shift(store, index, day, customer, start, end, pause, minutes):
+    # Problems a new shift would cause, before it is added: [(kind, other row)].
+    # Shifts of earlier days are included as far back as the longest shift in
+    # the sheet reaches, for night and multi-day shifts that end today.
+    if start != NO_TIME and end < start:
+        return [(END_BEFORE_START, None)]
+    problems = []
+    customer_id = store.customer_id(customer)
+    first = day * MINUTES_PER_DAY + start
+    last = day * MINUTES_PER_DAY + end
+    if start == NO_TIME:
+        rows = index.rows(day, day)  # v1: hours only, nothing reaches into other days
+    else:
+        rows = index.rows(day - index.longest_shift_days(), day + max(end, start) // MINUTES_PER_DAY)
+    for row in rows:
+        if (store.days[row], store.starts[row], store.ends[row], store.customers[row], store.pauses[row],
+                store.minutes[row]) == (day, start, end, customer_id, pause, minutes):
+            problems.append((DUPLICATE, row))
+        elif start != NO_TIME and store.starts[row] != NO_TIME:
+            other = store.days[row] * MINUTES_PER_DAY
+            if first < other + store.ends[row] and other + store.starts[row] < last:
+                problems.append((OVERLAP, row))
+    return problems
+
+
+def describe_shift(store, row):
+    shift = store[row]
+    times = f" {format_clock(shift.start)}-{format_clock(shift.end)}" if shift.start != NO_TIME else ""
+    return f"{format_date(shift.day)}{times} {shift.customer}"
+
+
+def describe(store, problem):
+    if problem.kind == END_BEFORE_START:
+        return f"{describe_shift(store, problem.row)}: end before start"
+    return f"{describe_shift(store, problem.row)}: {RELATION[problem.kind]} {describe_shift(store, problem.other)}"
+
+
+def summary(store, problems, limit=20):
+    lines = [describe(store, problem) for problem in problems[:limit]]
+    if len(problems) > limit:
+        lines.append(f"... and {len(problems) - limit} more")
+    return "\n".join(lines)
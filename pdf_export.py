@@ -0,0 +1,179 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
+
+import metrics
+from timesheet import shift_table_data
+
+# Built once per process and shared by every document, also in batch export
+
+styles = getSampleStyleSheet()
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -2), colors.white),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)])
+
+CELL_PADDING = 12
+FRAME_PADDING = 6  # SimpleDocTemplate's frame keeps this much free on every side
+
+SUM_STYLE = TableStyle([
+    ('BACKGROUND', (-1, -1), (-1, -1), colors.green),
+    ('TEXTCOLOR', (-1, -1), (-1, -1), colors.white)])
+
+
+def apply_table_style(table):
+    table.setStyle(TABLE_STYLE)
+    table.setStyle(SUM_STYLE)
+
+
+def create_header(text):
+    return Paragraph(text, styles['Title'])
+
+
+def build_pdf(filename, table_data, header="", progress=None, pagesize=letter):
+    doc = SimpleDocTemplate(filename, pagesize=pagesize)
+    table = Table(table_data)
+    apply_table_style(table)
+
+    elements = [table]
+    if header:
+        elements.insert(0, create_header(header))
+
+    def page_done(canvas, doc):
+        if progress:
+            progress(doc.page)
+
+    with metrics.span("pdf"):
+        doc.build(elements, onFirstPage=page_done, onLaterPages=page_done)
+    return filename
+
+
+def build_shifts_pdf(filename, shifts, total_minutes, header="", progress=None):
+    # Any list of shifts, e.g. a query.QueryResult, as a v2 timesheet
+    return build_pdf(filename, shift_table_data(shifts, total_minutes), header, progress=progress)
+
+
+# Cached export: the table is cut into one chunk per page, every chunk is
+# rendered as its own small PDF keyed by a hash of its content, and the pages
+# are joined with PyMuPDF. After a few shifts are added only the last page
+# changes, so only that page is laid out again.
+
+class PageCache:
+    def __init__(self, limit=5000):
+        self.limit = limit
+        self.pages = OrderedDict()
+        self.lock = threading.Lock()  # exports run on worker threads
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            page = self.pages.get(key)
+            if page is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.pages.move_to_end(key)
+            return page
+
+    def put(self, key, page):
+        with self.lock:
+            self.pages[key] = page
+            while len(self.pages) > self.limit:
+                self.pages.popitem(last=False)
+
+
+def column_widths(table_data):
+    # Fixed widths for all pages, so separately rendered pages line up
+    widths = [0] * len(table_data[0])
+    for row in table_data:
+        for column, text in enumerate(row):
+            widths[column] = max(widths[column], stringWidth(str(text), 'Helvetica-Bold', 10))
+    return [width + CELL_PADDING for width in widths]
+
+
+def page_chunks(head, rows, widths, header=""):
+    # Rows per page from the laid-out heights: the frame of a letter page, less
+    # the header rows every page repeats and, on the first page, the title,
+    # which can wrap over several lines
+    doc = SimpleDocTemplate(io.BytesIO(), pagesize=letter)
+    available = doc.height - 2 * FRAME_PADDING
+    sample = Table(head + rows[:1], colWidths=widths)
+    sample.setStyle(TABLE_STYLE)
+    sample.wrap(doc.width, available)
+    head_height = sum(sample._rowHeights[:len(head)])
+    row_height = sample._rowHeights[-1] if rows else available
+    title_height = 0
+    if header:
+        title = create_header(header)
+        title_height = title.wrap(doc.width, available)[1] + title.getSpaceBefore() + title.getSpaceAfter()
+
+    first = max(1, int((available - title_height - head_height) // row_height))
+    size = max(1, int((available - head_height) // row_height))
+    chunks = [rows[:first]]
+    for start in range(first, len(rows), size):
+        chunks.append(rows[start:start + size])
+    return chunks
+
+
+def render_page(header_rows, rows, widths, title="", last=False):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    table = Table(header_rows + rows, colWidths=widths, repeatRows=len(header_rows))
+    table.setStyle(TABLE_STYLE)
+    if last:
+        table.setStyle(SUM_STYLE)
+    with metrics.span("pdf_page"):
+        doc.build([create_header(title), table] if title else [table])
+    return buffer.getvalue()
+
+
+def build_document(table_data, header="", cache=None, header_rows=1, progress=None):
+    # The whole timesheet as an in-memory PyMuPDF document.
+    # table_data like build_pdf: header row(s), shifts, sum row last
+    import fitz
+
+    head, rows = table_data[:header_rows], table_data[header_rows:]
+    widths = column_widths(table_data)
+    chunks = page_chunks(head, rows, widths, header)
+
+    document = fitz.open()
+    for number, chunk in enumerate(chunks):
+        title = header if number == 0 else ""
+        last = number == len(chunks) - 1
+        key = hashlib.sha1(repr((head, chunk, widths, title, last)).encode()).hexdigest()
+        page = cache.get(key) if cache else None
+        if page is None:
+            page = render_page(head, chunk, widths, title, last)
+            if cache:
+                cache.put(key, page)
+        else:
+            metrics.count("pdf_page.cached")
+        with fitz.open("pdf", page) as part:
+            document.insert_pdf(part)
+        if progress:
+            progress(number + 1)
+    return document
+
+
+def build_pdf_cached(filename, table_data, header="", cache=None, header_rows=1, progress=None):
+    try:
+        import fitz
+    except ImportError:
+        return build_pdf(filename, table_data, header, progress=progress)
+    with metrics.span("pdf"):
+        document = build_document(table_data, header, cache, header_rows, progress)
+        document.save(filename, garbage=3, deflate=True)
+        document.close()
+    return filename
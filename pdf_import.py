@@ -0,0 +1,276 @@
+import csv
+import hashlib
+import json
+import os
+import re
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from timesheet import SHIFT_COLUMNS, parse_date, parse_clock, format_date
+
+# Reads the shift table back out of PDFs written by the programs (v1, v2,
+# cached export and batch export). PyMuPDF gives every word with its box and
+# the lines of the table grid. A word belongs to the grid cell its centre is
+# in; the cells of the "Dato ... Arbeidstid" heading name the columns. Pages
+# without a heading (a long table split by build_pdf) use the columns of the
+# page before. Text above the first heading is the title, which the programs
+# fill with the worker's name (and the period, in batch export).
+#
+# Many files are read in a process pool. Results are cached by the SHA-1 of
+# the file, and files whose size and mtime did not change are not even read
+# again, so re-scanning an archive only extracts the new files.
+
+COLUMNS = SHIFT_COLUMNS + ["Sluttdato"]
+ROW_TOLERANCE = 3  # points; words of one table row differ less than this in height
+WORD_GAP = 6  # points; words closer than this belong to the same heading cell
+PARALLEL_MIN_FILES = 4
+CACHE_VERSION = 2
+SUM_LABEL = "Sum Timer"
+PERIOD = re.compile(r"^(.*\S)\s+(\d{4}-(?:W\d{2}|\d{2}))$")  # "Ola 2024-02" from batch export
+
+
+def _rows(words):
+    # [(middle, [word, ...]) per line from top to bottom], words as (x0, y0, x1, y1, text)
+    rows = []
+    for word in sorted(words, key=lambda word: ((word[1] + word[3]) / 2, word[0])):
+        middle = (word[1] + word[3]) / 2
+        if rows and middle - rows[-1][0] <= ROW_TOLERANCE:
+            rows[-1][1].append(word)
+        else:
+            rows.append([middle, [word]])
+    return [(middle, sorted(row, key=lambda word: word[0])) for middle, row in rows]
+
+
+def _grid(page):
+    # (x of every vertical grid line, top, bottom) of the table on the page, or None
+    lines = [(item[1].x, min(item[1].y, item[2].y), max(item[1].y, item[2].y))
+             for drawing in page.get_drawings() for item in drawing["items"]
+             if item[0] == "l" and abs(item[1].x - item[2].x) < 0.5]
+    edges = sorted({round(x, 1) for x, _, _ in lines})
+    if len(edges) < 2:
+        return None
+    return edges, min(top for _, top, _ in lines), max(bottom for _, _, bottom in lines)
+
+
+def _cells(row):
+    # Words joined into cells wherever the gap is small: [(text, x centre)]
+    cells = []
+    for x0, _, x1, _, text in row:
+        if cells and x0 - cells[-1][2] < WORD_GAP:
+            cells[-1][0] += " " + text
+            cells[-1][2] = x1
+        else:
+            cells.append([text, x0, x1])
+    return [(text, (x0 + x1) / 2) for text, x0, x1 in cells]
+
+
+def _column(edges, word):
+    return min(max(bisect_right(edges, (word[0] + word[2]) / 2) - 1, 0), len(edges) - 2)
+
+
+def _heading(row, grid):
+    # (column names, column edges) when row is the table heading, else None.
+    # Without a grid every heading cell reaches halfway to its neighbours
+    cells = _cells(row)
+    names = [text for text, _ in cells]
+    if "Dato" not in names or "Arbeidstid" not in names:
+        return None
+    if grid is None:
+        centres = [x for _, x in cells]
+        return names, [float("-inf")] + [(a + b) / 2 for a, b in zip(centres, centres[1:])] + [float("inf")]
+    edges = grid[0]
+    words = [[] for _ in edges[1:]]
+    for word in row:
+        words[_column(edges, word)].append(word[4])
+    return [" ".join(column) for column in words], edges
+
+
+def _record(row, heading):
+    names, edges = heading
+    values = [[] for _ in names]
+    for word in row:
+        values[_column(edges, word)].append(word[4])
+    return {name: " ".join(words) for name, words in zip(names, values) if name}
+
+
+def _split_end(record):
+    # "06:00+1" -> Sluttid 06:00; a Sluttdato only where the day cannot be guessed
+    # (the importer already puts an end before the start on the next day)
+    end, plus, days = record.get("Sluttid", "").partition("+")
+    if not plus:
+        return
+    if not days.isdigit():
+        raise ValueError(f"Invalid end time: {record['Sluttid']}")
+    record["Sluttid"] = end
+    day = parse_date(record["Dato"])
+    if int(days) > 1 or parse_clock(end) >= parse_clock(record["Starttid"]):
+        record["Sluttdato"] = format_date(day + int(days))
+
+
+def split_title(title):
+    # (name, period) of a PDF title; batch export writes "Navn 2024-02" or "Navn 2024-W05"
+    match = PERIOD.match(title)
+    return (match.group(1), match.group(2)) if match else (title, "")
+
+
+def extract_document(document):
+    # (title, [record dict per shift], [error]) of an open fitz document. A table
+    # row that cannot be read is an error {"page", "text", "message", "index",
+    # "record"}, index being its place among the records
+    title = []
+    heading = None
+    records = []
+    errors = []
+    for page_number, page in enumerate(document, start=1):
+        grid = _grid(page)
+        rows = _rows([word[:5] for word in page.get_text("words")])
+        headings = [_heading(row, grid) for _, row in rows]
+        first = next((i for i, found in enumerate(headings) if found), 0)
+        for i, (middle, row) in enumerate(rows):
+            if headings[i]:
+                heading = headings[i]
+                continue
+            text = " ".join(word[4] for word in row)
+            if heading is None:
+                if text not in title:  # v1 has the name both above and in the table
+                    title.append(text)
+                continue
+            if i < first or (grid is not None and not grid[1] <= middle <= grid[2]):
+                continue  # the v1 title row repeated on every page, text outside the table
+            record = _record(row, heading)
+            if SUM_LABEL in record.values():
+                continue
+            try:
+                parse_date(record.get("Dato", ""))
+                _split_end(record)
+            except ValueError as e:
+                errors.append({"page": page_number, "text": text, "message": str(e), "index": len(records),
+                               "record": record})
+                continue
+            records.append(record)
+    return " ".join(title), records, errors
+
+
+def extract_file(path):
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as document:
+        return extract_document(document)
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _extract(job):
+    # Runs in the worker processes; a damaged PDF must not stop the whole archive
+    path, digest = job
+    try:
+        title, records, errors = extract_file(path)
+    except Exception as e:
+        return path, digest, None, f"{type(e).__name__}: {e}"
+    return path, digest, {"title": title, "records": records, "errors": errors}, None
+
+
+def find_pdfs(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                files.extend(os.path.join(folder, name) for name in names if name.lower().endswith(".pdf"))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def new_cache():
+    return {"version": CACHE_VERSION, "files": {}, "tables": {}}
+
+
+def load_cache(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return new_cache()
+    return cache if cache.get("version") == CACHE_VERSION else new_cache()
+
+
+def save_cache(cache, path):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(path + ".tmp", path)
+
+
+def extract_files(paths, cache=None, workers=None, progress=None):
+    # ({path: {"title", "records", "errors"}}, {path: error message}) for the PDFs in paths.
+    # cache is a load_cache() dict and is updated in place.
+    cache = cache if cache is not None else new_cache()
+    known, tables = cache["files"], cache["tables"]
+    digests, errors, jobs = {}, {}, {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            key = os.path.abspath(path)
+            entry = known.get(key)
+            if entry and entry[:2] == [stat.st_size, stat.st_mtime_ns] and entry[2] in tables:
+                digest = entry[2]
+            else:
+                digest = file_hash(path)
+                known[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        except OSError as e:
+            errors[path] = str(e)
+            continue
+        digests[path] = digest
+        if digest not in tables:
+            jobs.setdefault(digest, path)  # identical copies are read once
+    jobs = [(path, digest) for digest, path in jobs.items()]
+    done = 0
+
+    def collect(path, digest, table, error):
+        nonlocal done
+        if error is None:
+            tables[digest] = table
+        else:
+            errors[path] = error
+        done += 1
+        if progress:
+            progress(done, len(jobs))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) < PARALLEL_MIN_FILES:
+        for job in jobs:
+            collect(*_extract(job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for future in as_completed([executor.submit(_extract, job) for job in jobs]):
+                collect(*future.result())
+
+    return {path: tables[digest] for path, digest in digests.items() if digest in tables}, errors
+
+
+def write_csv(results, output):
+    # One row per shift; Navn (and Periode) from the title of the PDF, Fil the file it came from
+    writer = csv.DictWriter(output, fieldnames=["Navn", "Periode"] + COLUMNS + ["Fil"], extrasaction="ignore")
+    writer.writeheader()
+    rows = 0
+    for path, table in sorted(results.items()):
+        name, period = split_title(table["title"])
+        for record in table["records"]:
+            writer.writerow(dict(record, Navn=name, Periode=period, Fil=path))
+            rows += 1
+    return rows
+
+
+def read_records(path):
+    # For importer.read_records: (row number, record) of one PDF. Rows that
+    # could not be read are passed on as they are, so the importer reports them
+    _, records, errors = extract_file(path)
+    rows = list(records)
+    for error in reversed(errors):
+        rows.insert(error["index"], error["record"])
+    return enumerate(rows, start=1)
@@ -0,0 +1,157 @@
+import array
+from bisect import bisect_left, bisect_right
+
+from timesheet import MINUTES_PER_DAY
+
+# Indexes over a TimesheetStore for date range and customer queries, so
+# invoicing summaries do not scan every row:
+#   - rows sorted by ordinal day (binary search for the range)
+#   - customer id -> the same sorted index for that customer's rows only
+# Appends and removing the last row (undo of an add) keep the indexes up to
+# date as they happen. Rows inserted or deleted in the middle move every later
+# row number, so those mark the indexes stale and the next query rebuilds them once.
+
+
+class DayIndex:
+    # Row numbers in (day, row) order with the days alongside for bisect
+    def __init__(self):
+        self.days = array.array("i")
+        self.rows = array.array("i")
+
+    def append(self, day, row):
+        # Rows arrive in increasing row order, so the new row goes after every equal day
+        position = bisect_right(self.days, day)
+        self.days.insert(position, day)
+        self.rows.insert(position, row)
+
+    def remove_last(self, day, row):
+        # The newest row is the last one of its day; False when it is not there
+        position = bisect_right(self.days, day) - 1
+        if position < 0 or self.rows[position] != row:
+            return False
+        del self.days[position]
+        del self.rows[position]
+        return True
+
+    def between(self, first=None, last=None):
+        lo = 0 if first is None else bisect_left(self.days, first)
+        hi = len(self.days) if last is None else bisect_right(self.days, last)
+        return self.rows[lo:hi]
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class ShiftIndex:
+    def __init__(self, store):
+        self.store = store
+        self.stale = True
+        store.subscribe(self.apply)
+
+    def apply(self, action, index):
+        if self.stale:
+            return
+        if action == "insert" and index == len(self.store) - 1:
+            self._add(index)
+        elif action == "delete" and index == len(self.store):
+            self._remove_last(index)
+        else:
+            self.stale = True
+
+    def _add(self, row):
+        day, customer_id = self.store.days[row], self.store.customers[row]
+        self.days.append(day)
+        self.customers.append(customer_id)
+        self.longest = max(self.longest, self.store.ends[row] // MINUTES_PER_DAY)
+        self.by_day.append(day, row)
+        bucket = self.by_customer.get(customer_id)
+        if bucket is None:
+            bucket = self.by_customer[customer_id] = DayIndex()
+        bucket.append(day, row)
+
+    def _remove_last(self, row):
+        # The store already dropped the row, the copies below still know its day and customer
+        day, customer_id = self.days.pop(), self.customers.pop()
+        if not (self.by_day.remove_last(day, row) and self.by_customer[customer_id].remove_last(day, row)):
+            self.stale = True
+
+    def rebuild(self):
+        days, customers = self.store.days, self.store.customers
+        order = sorted(range(len(days)), key=days.__getitem__)  # stable, equal days stay in row order
+        self.days = array.array("i", days)
+        self.customers = array.array("i", customers)
+        self.longest = max(0, max(self.store.ends, default=0) // MINUTES_PER_DAY)
+
+        self.by_day = DayIndex()
+        self.by_day.rows = array.array("i", order)
+        self.by_day.days = array.array("i", (days[row] for row in order))
+
+        self.by_customer = {}
+        for row in order:
+            bucket = self.by_customer.get(customers[row])
+            if bucket is None:
+                bucket = self.by_customer[customers[row]] = DayIndex()
+            bucket.days.append(days[row])
+            bucket.rows.append(row)
+        self.stale = False
+
+    def rows(self, first=None, last=None, customer=None):
+        # Row numbers of the matching shifts in date order. first / last are
+        # ordinal days (both included), customer is a name.
+        if self.stale:
+            self.rebuild()
+        if customer is None:
+            return self.by_day.between(first, last)
+        customer_id = self.store.customer_id(customer)
+        if customer_id not in self.by_customer:
+            return array.array("i")
+        return self.by_customer[customer_id].between(first, last)
+
+    def longest_shift_days(self):
+        # How many days after its start day the longest shift ends (0: all end the same day)
+        if self.stale:
+            self.rebuild()
+        return self.longest
+
+    def query(self, first=None, last=None, customer=None):
+        return QueryResult(self.store, self.rows(first, last, customer))
+
+    def customer_summary(self, first=None, last=None):
+        # {customer name: minutes} for an invoicing period, one range lookup per customer
+        if self.stale:
+            self.rebuild()
+        minutes, names = self.store.minutes, self.store.customer_names
+        summary = {}
+        for customer_id, bucket in self.by_customer.items():
+            rows = bucket.between(first, last)
+            if rows:
+                summary[names[customer_id]] = sum(minutes[row] for row in rows)
+        return summary
+
+
+class QueryResult:
+    def __init__(self, store, rows):
+        self.store = store
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return (self.store[row] for row in self.rows)
+
+    @property
+    def total(self):
+        minutes = self.store.minutes
+        return sum(minutes[row] for row in self.rows)
+
+    def shifts(self):
+        return list(self)
+
+
+def merge_results(results):
+    # Shifts of several stores (e.g. one per worker) as one list in date order
+    shifts = [shift for result in results for shift in result]
+    shifts.sort(key=lambda shift: (shift.day, shift.start))
+    return shifts, sum(result.total for result in results)
+
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import fitz  # PyMuPDF
+
+import metrics
+
+# Page-parallel PDF -> JPG. Every worker process opens the PDF itself, so only
+# file names and page numbers travel between processes, and at most
+# max_in_flight pages are being rendered at any time.
+#
+# skip_unchanged (off by default) leaves a JPG alone when the page would be
+# rendered the same: same source PDF, same page content and resources (fonts,
+# images) and the JPG still the one that was written. The hashes live in
+# ~/.worker_time_list/jpg_hashes, one file per output folder.
+
+HASH_FOLDER = "jpg_hashes"
+PARALLEL_MIN_PAGES = 8  # below this the process start-up costs more than it saves
+
+_documents = {}
+
+
+def _open(pdf_filename):
+    # One open document per worker process, reused for all its pages
+    document = _documents.get(pdf_filename)
+    if document is None:
+        document = _documents[pdf_filename] = fitz.open(pdf_filename)
+    return document
+
+
+REFERENCE = re.compile(rb"(\d+) 0 R")
+PARENT = re.compile(rb"/Parent\s+\d+ 0 R")
+
+
+def page_hash(page, dpi, quality):
+    # The page object and everything it refers to (content streams, fonts,
+    # images, forms), but not the page tree, so other pages do not count
+    document = page.parent
+    digest = hashlib.sha1(f"{page.rect}|{dpi}|{quality}".encode())
+    seen = set()
+    pending = [page.xref]
+    while pending:
+        xref = pending.pop()
+        if xref in seen:
+            continue
+        seen.add(xref)
+        source = PARENT.sub(b"", document.xref_object(xref, compressed=True).encode())
+        digest.update(source)
+        if document.xref_is_stream(xref):
+            digest.update(document.xref_stream_raw(xref))
+        pending.extend(int(number) for number in REFERENCE.findall(source))
+    return digest.hexdigest()
+
+
+def save_jpeg(pixmap, image_path, quality):
+    try:
+        # Encodes straight from the pixmap buffer (PyMuPDF 1.22+)
+        pixmap.save(image_path, output="jpeg", jpg_quality=quality)
+    except TypeError:
+        from PIL import Image
+        image = Image.frombytes("RGB", [pixmap.width, pixmap.height], pixmap.samples)
+        image.save(image_path, "JPEG", quality=quality)
+
+
+def _image_stamp(image_path):
+    stat = os.stat(image_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def image_path(output_folder, page_number):
+    return os.path.join(output_folder, f"page_{page_number + 1}.jpg")
+
+
+def render_page(pdf_filename, page_number, output_folder, dpi, quality, skip=False, known=None):
+    # -> (page number, hash or None, error, seconds); the time goes back to the
+    # parent process, which records it (metrics are per process).
+    # known: [hash, JPG size, JPG mtime] from the last run with skip on
+    start = time.perf_counter()
+    page = _open(pdf_filename)[page_number]
+    path = image_path(output_folder, page_number)
+    digest = page_hash(page, dpi, quality) if skip else None
+    if known and digest == known[0]:
+        try:
+            if _image_stamp(path) == known[1:]:
+                return page_number, digest, None, None
+        except OSError:
+            pass
+
+    try:
+        save_jpeg(page.get_pixmap(dpi=dpi), path, quality)
+    except Exception as e:
+        return page_number, None, str(e), None
+    return page_number, digest, None, time.perf_counter() - start
+
+
+def _hash_path(pdf_filename, output_folder):
+    from storage import default_session_path
+
+    folder = default_session_path(HASH_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    key = hashlib.sha1(os.path.abspath(output_folder).encode()).hexdigest()
+    return os.path.join(folder, key + ".json")
+
+
+def _load_hashes(path, pdf_filename):
+    # {page number: [hash, JPG size, JPG mtime]} when the folder was last filled from the same PDF
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return saved.get("pages", {}) if saved.get("source") == os.path.abspath(pdf_filename) else {}
+
+
+def _save_hashes(path, pdf_filename, hashes):
+    # Only a cache: a failed write must not turn a finished conversion (or the
+    # error that stopped it) into a different error
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"source": os.path.abspath(pdf_filename), "pages": hashes}, f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        metrics.count("rasterize.hash_file_errors")
+
+
+def rasterize_pdf(pdf_filename, output_folder, dpi=72, quality=95, workers=None, max_in_flight=None,
+                  skip_unchanged=False, progress=None):
+    with fitz.open(pdf_filename) as document:
+        total_pages = document.page_count
+
+    hash_path = _hash_path(pdf_filename, output_folder) if skip_unchanged else None
+    known = _load_hashes(hash_path, pdf_filename) if skip_unchanged else {}
+    # Pages left unrendered by a cancel keep their old image, so keep their old hash too
+    hashes = {key: value for key, value in known.items() if int(key) < total_pages}
+    failed = []
+    done = 0
+
+    def collect(result):
+        nonlocal done
+        page_number, digest, error, seconds = result
+        if seconds is not None:
+            metrics.record("rasterize_page", seconds)
+        elif error is None:
+            metrics.count("rasterize_page.unchanged")
+        hashes.pop(str(page_number), None)
+        if error is None:
+            if digest is not None:
+                try:
+                    hashes[str(page_number)] = [digest] + _image_stamp(image_path(output_folder, page_number))
+                except OSError:
+                    pass
+        else:
+            metrics.count("rasterize_page.errors")
+            failed.append(page_number + 1)
+        done += 1
+        if progress:
+            progress(done, total_pages)
+
+    workers = workers or os.cpu_count() or 1
+    try:
+        if workers == 1 or total_pages < PARALLEL_MIN_PAGES:
+            for page_number in range(total_pages):
+                collect(render_page(pdf_filename, page_number, output_folder, dpi, quality, skip_unchanged,
+                                    known.get(str(page_number))))
+        else:
+            max_in_flight = max_in_flight or workers * 2
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = set()
+                try:
+                    for page_number in range(total_pages):
+                        pending.add(executor.submit(render_page, pdf_filename, page_number, output_folder,
+                                                    dpi, quality, skip_unchanged, known.get(str(page_number))))
+                        if len(pending) >= max_in_flight:
+                            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in finished:
+                                collect(future.result())
+                    for future in pending:
+                        collect(future.result())
+                except BaseException:
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+    finally:
+        document = _documents.pop(pdf_filename, None)
+        if document is not None:
+            document.close()
+        if skip_unchanged:
+            _save_hashes(hash_path, pdf_filename, hashes)
+
+    return failed
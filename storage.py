@@ -0,0 +1,173 @@
+import array
+import os
+import sqlite3
+
+from timesheet import TimesheetStore
+
+# Durable session: every row added to or deleted from a TimesheetStore is
+# written to SQLite (WAL journal, synchronous=FULL) right away, so a crash
+# loses nothing. Reopening reads the columns back in one ordered scan instead
+# of replaying an edit history.
+#
+# Rows keep their order through a REAL "pos" column: appends get last + 1,
+# rows put back in the middle (undo of a delete) get the midpoint of their
+# neighbours.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shifts (
+    id INTEGER PRIMARY KEY,
+    pos REAL NOT NULL,
+    day INTEGER NOT NULL,
+    customer INTEGER NOT NULL,
+    start_min INTEGER NOT NULL,
+    end_min INTEGER NOT NULL,
+    pause INTEGER NOT NULL,
+    minutes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS shifts_pos ON shifts (pos);
+"""
+
+INSERT_SHIFT = ("INSERT INTO shifts (id, pos, day, customer, start_min, end_min, pause, minutes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+LOAD_CHUNK = 50000
+
+
+def default_session_path(name):
+    folder = os.path.join(os.path.expanduser("~"), ".worker_time_list")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, name)
+
+
+def session_path(argv, name):
+    # Only with --session: the sheet is kept in ~/.worker_time_list/name, or in
+    # the file given as --session PATH. Without it every start is an empty sheet
+    if "--session" not in argv:
+        return None
+    position = argv.index("--session") + 1
+    if position < len(argv) and not argv[position].startswith("-"):
+        return argv[position]
+    return default_session_path(name)
+
+
+def open_session(path, store):
+    try:
+        session = SessionStore(path)
+        session.load(store)
+    except sqlite3.Error as e:
+        raise ValueError(f"Could not open the session file {path}: {e}") from None
+    return session
+
+
+class SessionStore:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level=None)  # autocommit, one transaction per write
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=FULL")
+        self.connection.executescript(SCHEMA)
+
+        self.store = None
+        self.ids = array.array("q")  # database id of every store row
+        self.positions = array.array("d")
+        self.saved_customers = 0
+        self.next_id = 1
+
+    def row_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM shifts").fetchone()[0]
+
+    def load(self, store=None):
+        # Fills an empty store with the saved rows and keeps it saved from then on
+        store = store if store is not None else TimesheetStore()
+        if len(store):
+            raise ValueError("The session can only be loaded into an empty sheet.")
+
+        # Customer ids in the database are the store's own ids
+        for customer_id, name in self.connection.execute("SELECT id, name FROM customers ORDER BY id"):
+            if store.intern_customer(name) != customer_id:
+                raise ValueError(f"Damaged session file: {self.path}")
+        self.saved_customers = len(store.customer_names)
+
+        cursor = self.connection.execute(
+            "SELECT id, pos, day, customer, start_min, end_min, pause, minutes FROM shifts ORDER BY pos")
+        while True:
+            rows = cursor.fetchmany(LOAD_CHUNK)
+            if not rows:
+                break
+            ids, positions, days, customers, starts, ends, pauses, minutes = zip(*rows)
+            self.ids.extend(ids)
+            self.positions.extend(positions)
+            store.extend(array.array("i", days), array.array("i", customers), array.array("i", starts),
+                         array.array("i", ends), array.array("b", pauses), array.array("i", minutes))
+
+        self.next_id = self.connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM shifts").fetchone()[0]
+        self.store = store
+        store.subscribe(self.on_change)
+        return store
+
+    def _save_customers(self):
+        names = self.store.customer_names
+        if self.saved_customers < len(names):
+            self.connection.executemany("INSERT OR IGNORE INTO customers (id, name) VALUES (?, ?)",
+                                        ((i, names[i]) for i in range(self.saved_customers, len(names))))
+            self.saved_customers = len(names)
+
+    def _position(self, index):
+        count = len(self.positions)
+        if index == count:
+            return self.positions[-1] + 1 if count else 0.0
+        before = self.positions[index - 1] if index else self.positions[0] - 1
+        position = (before + self.positions[index]) / 2
+        if position in (before, self.positions[index]):
+            self._renumber()
+            return self._position(index)
+        return position
+
+    def _renumber(self):
+        # Only needed after very many inserts at the same spot
+        self.positions = array.array("d", range(len(self.ids)))
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany("UPDATE shifts SET pos = ? WHERE id = ?",
+                                        zip(self.positions, self.ids))
+
+    def _row_values(self, index, position):
+        s = self.store
+        return (self.ids[index], position, s.days[index], s.customers[index], s.starts[index], s.ends[index],
+                s.pauses[index], s.minutes[index])
+
+    def _new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def on_change(self, action, index):
+        if action == "insert":
+            self._save_customers()
+            position = self._position(index)
+            self.ids.insert(index, self._new_id())
+            self.positions.insert(index, position)
+            self.connection.execute(INSERT_SHIFT, self._row_values(index, position))
+        elif action == "delete":
+            self.connection.execute("DELETE FROM shifts WHERE id = ?", (self.ids[index],))
+            del self.ids[index]
+            del self.positions[index]
+        elif action == "extend":
+            # One transaction for the whole import batch
+            first_position = self._position(index)
+            count = len(self.store) - index
+            self.ids.extend(range(self.next_id, self.next_id + count))
+            self.positions.extend(first_position + i for i in range(count))
+            self.next_id += count
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self._save_customers()
+                self.connection.executemany(INSERT_SHIFT, zip(
+                    self.ids[index:], self.positions[index:], self.store.days[index:],
+                    self.store.customers[index:], self.store.starts[index:], self.store.ends[index:],
+                    self.store.pauses[index:], self.store.minutes[index:]))
+
+    def close(self):
+        self.connection.close()
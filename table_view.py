@@ -0,0 +1,237 @@
+import metrics
+
+# View-model between a TimesheetStore and a ttk.Treeview: only changed rows touch the widget
+
+VIRTUAL_ROWS = 5000  # larger sheets are opened with VirtualTreeviewModel
+
+
+class TreeviewModel:
+    # With a frames.FrameScheduler the sum row is refreshed once per frame
+    # instead of after every changed row
+    def __init__(self, tree, store, format_row, header_rows=(), sum_row=None, scheduler=None):
+        self.tree = tree
+        self.store = store
+        self.format_row = format_row
+        self.sum_row = sum_row
+        self.scheduler = scheduler
+
+        self.header_items = [tree.insert("", "end", values=row) for row in header_rows]
+        self.items = [tree.insert("", "end", values=format_row(shift)) for shift in store]
+        self.sum_item = tree.insert("", "end", values=sum_row()) if sum_row else None
+
+        store.subscribe(self.apply)
+
+    def attach_scrollbar(self, scrollbar):
+        scrollbar.configure(command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+    def apply(self, action, index):
+        with metrics.span("treeview"):
+            if action == "insert":
+                self.row_inserted(index)
+            elif action == "delete":
+                self.row_deleted(index)
+            elif action == "extend":
+                self.rows_appended(index)
+            if self.scheduler:
+                self.scheduler.request(("sum", id(self)), self.refresh_sum)
+            else:
+                self.refresh_sum()
+
+    def row_inserted(self, index):
+        item = self.tree.insert("", len(self.header_items) + index, values=self.format_row(self.store[index]))
+        self.items.insert(index, item)
+
+    def row_deleted(self, index):
+        self.tree.delete(self.items.pop(index))
+
+    def rows_appended(self, first):
+        position = len(self.header_items) + first
+        for index in range(first, len(self.store)):
+            self.items.append(self.tree.insert("", position, values=self.format_row(self.store[index])))
+            position += 1
+
+    def row_updated(self, index):
+        self.tree.item(self.items[index], values=self.format_row(self.store[index]))
+
+    def refresh_sum(self):
+        if self.sum_item is not None:
+            self.tree.item(self.sum_item, values=self.sum_row())
+
+    def set_header_rows(self, rows):
+        for item, row in zip(self.header_items, rows):
+            self.tree.item(item, values=row)
+
+    def index_of(self, item):
+        # Store index of a Treeview item, None for the header and sum rows
+        try:
+            return self.items.index(item)
+        except ValueError:
+            return None
+
+    def detach(self):
+        # Stops following the store and empties the Treeview, e.g. to switch to VirtualTreeviewModel
+        self.store.unsubscribe(self.apply)
+        self.tree.delete(*self.header_items, *self.items,
+                         *([self.sum_item] if self.sum_item is not None else []))
+
+    def rebuild(self):
+        # Full reload, only for bulk changes such as opening a saved sheet
+        self.tree.delete(*self.items)
+        offset = len(self.header_items)
+        self.items = [self.tree.insert("", offset + i, values=self.format_row(shift))
+                      for i, shift in enumerate(self.store)]
+        self.refresh_sum()
+
+
+class VirtualTreeviewModel:
+    # Same interface as TreeviewModel, but the Treeview only ever holds the rows
+    # that fit on screen. Scrolling re-fills those few items from the store,
+    # once per frame when a frames.FrameScheduler is given. The row height is
+    # measured (theme, font and DPI decide it) unless row_height is given.
+    def __init__(self, tree, store, format_row, header_rows=(), sum_row=None, row_height=None, scheduler=None):
+        self.tree = tree
+        self.store = store
+        self.format_row = format_row
+        self.sum_row = sum_row
+        self.row_height = row_height
+        self.scheduler = scheduler
+        self.scrollbar = None
+        self.remeasure = None
+
+        self.first = 0
+        self.visible = int(tree.cget("height"))
+
+        self.header_items = [tree.insert("", "end", values=row) for row in header_rows]
+        self.slots = []
+        self.sum_item = tree.insert("", "end", values=sum_row()) if sum_row else None
+
+        store.subscribe(self.apply)
+        tree.bind("<Configure>", self._on_resize, add="+")
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tree.bind(sequence, self._on_wheel)
+
+        self.render()
+        if tree.winfo_height() > 1:
+            # Already on screen (switched to from TreeviewModel), no <Configure> will come
+            self.fit_height(tree.winfo_height())
+
+    def attach_scrollbar(self, scrollbar):
+        self.scrollbar = scrollbar
+        scrollbar.configure(command=self.yview)
+        self._update_scrollbar()
+
+    def render(self):
+        count = max(0, min(self.visible, len(self.store) - self.first))
+        offset = len(self.header_items)
+        while len(self.slots) < count:
+            self.slots.append(self.tree.insert("", offset + len(self.slots)))
+        while len(self.slots) > count:
+            self.tree.delete(self.slots.pop())
+
+        for k, item in enumerate(self.slots):
+            self.tree.item(item, values=self.format_row(self.store[self.first + k]))
+
+        self.refresh_sum()
+        self._update_scrollbar()
+
+    def scroll_to(self, first):
+        first = max(0, min(first, len(self.store) - self.visible))
+        if first != self.first:
+            # Slots are reused for other rows, so a selection would point at the wrong shift
+            self.tree.selection_remove(*self.tree.selection())
+            self.first = first
+        if self.scheduler:
+            self.scheduler.request(("render", id(self)), self.render)
+        else:
+            self.render()
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.store)))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (self.visible if args[2] == "pages" else 1)
+            self.scroll_to(self.first + step)
+
+    def _on_wheel(self, event):
+        step = 3 if event.num == 5 or event.delta < 0 else -3
+        self.scroll_to(self.first + step)
+        return "break"
+
+    def _on_resize(self, event):
+        self.fit_height(event.height)
+
+    def measure_rows(self):
+        # (row height, height above the first row, measured on screen) in
+        # pixels. A drawn row gives both; before that the style's rowheight,
+        # with the column headings taken as one row
+        if self.row_height:
+            return self.row_height, self.row_height, True
+        items = self.header_items + self.slots + ([self.sum_item] if self.sum_item is not None else [])
+        if items:
+            box = self.tree.bbox(items[0])
+            if box and box[3] > 0:
+                return box[3], box[1], True
+        try:
+            from tkinter import ttk
+            height = int(ttk.Style(self.tree).lookup(self.tree.cget("style") or "Treeview", "rowheight"))
+        except (ValueError, TypeError):
+            height = 20
+        return height, height, False
+
+    def _remeasure(self):
+        height = self.tree.winfo_height()
+        if height > 1:
+            self.fit_height(height)
+        else:
+            self.remeasure = None  # not on screen yet, the next <Configure> tries again
+
+    def fit_height(self, height):
+        pinned = len(self.header_items) + (1 if self.sum_item is not None else 0)
+        row_height, top, measured = self.measure_rows()
+        if not measured and not self.remeasure:
+            # Measure again once the rows are drawn
+            self.remeasure = self.tree.after_idle(self._remeasure)
+        visible = max(1, (height - top) // row_height - pinned)
+        if visible != self.visible:
+            self.visible = visible
+            self.scroll_to(self.first)
+
+    def _update_scrollbar(self):
+        if self.scrollbar is None:
+            return
+        total = len(self.store)
+        if total <= self.visible:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.first / total, (self.first + self.visible) / total)
+
+    def apply(self, action, index):
+        # Keep following the end of the sheet while new rows are appended
+        with metrics.span("treeview"):
+            if action == "insert" and index == len(self.store) - 1 and self.first + self.visible >= index:
+                self.scroll_to(len(self.store))
+            else:
+                self.scroll_to(self.first)
+
+    def row_updated(self, index):
+        if self.first <= index < self.first + len(self.slots):
+            self.tree.item(self.slots[index - self.first], values=self.format_row(self.store[index]))
+
+    def refresh_sum(self):
+        if self.sum_item is not None:
+            self.tree.item(self.sum_item, values=self.sum_row())
+
+    def set_header_rows(self, rows):
+        for item, row in zip(self.header_items, rows):
+            self.tree.item(item, values=row)
+
+    def index_of(self, item):
+        try:
+            index = self.first + self.slots.index(item)
+        except ValueError:
+            return None
+        return index if index < len(self.store) else None
+
+    def rebuild(self):
+        self.scroll_to(self.first)
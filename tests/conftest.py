@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live flat in the repository root, next to the two programs
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
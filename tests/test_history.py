@@ -0,0 +1,83 @@
+import random
+
+from timesheet import History, TimesheetStore, week_of
+
+
+def totals_of(shifts):
+    by_day, by_week = {}, {}
+    for shift in shifts:
+        by_day[shift.day] = by_day.get(shift.day, 0) + shift.minutes
+        by_week[week_of(shift.day)] = by_week.get(week_of(shift.day), 0) + shift.minutes
+    return sum(shift.minutes for shift in shifts), by_day, by_week
+
+
+def check_store(store, expected):
+    assert list(store) == expected
+    total, by_day, by_week = totals_of(expected)
+    assert store.totals.total == total
+    assert {day: minutes for day, minutes in store.totals.by_day.items() if minutes} == by_day
+    assert {week: minutes for week, minutes in store.totals.by_week.items() if minutes} == by_week
+    for name in {shift.customer for shift in expected}:
+        assert store.customer_total(name) == sum(shift.minutes for shift in expected if shift.customer == name)
+
+
+def test_undo_redo_matches_snapshots():
+    # Every undo must bring back exactly the table before the operation, every redo the one after
+    rng = random.Random(3)
+    store = TimesheetStore()
+    history = History(store, depth=1000)
+    snapshots = [[]]  # table after each operation still in the undo log
+    undone = []
+    for _ in range(2000):
+        choice = rng.random()
+        if choice < 0.4 or not len(store):
+            start = rng.randrange(0, 1440, 15)
+            history.add(738000 + rng.randrange(60), rng.choice("ABC"), rng.randrange(30, 600),
+                        start=start, end=start + rng.randrange(30, 900), pause=rng.random() < 0.5)
+            snapshots.append(list(store))
+            undone.clear()
+        elif choice < 0.6:
+            history.delete(rng.randrange(len(store)))
+            snapshots.append(list(store))
+            undone.clear()
+        elif choice < 0.85 and history.can_undo():
+            undone.append(snapshots.pop())
+            assert history.undo() is not None
+        elif history.can_redo():
+            assert history.redo() is not None
+            snapshots.append(undone.pop())
+        check_store(store, snapshots[-1])
+
+
+def test_undo_reports_the_store_change():
+    store = TimesheetStore()
+    history = History(store)
+    first = history.add(738000, "A", 60)
+    second = history.add(738001, "B", 90)
+    history.delete(first)
+    assert history.undo() == ("insert", first)
+    assert history.undo() == ("delete", second)
+    assert history.redo() == ("insert", second)
+    assert history.redo() == ("delete", first)
+    assert history.redo() is None
+    check_store(store, [store[0]])
+    assert store[0].customer == "B"
+
+
+def test_new_operation_clears_redo():
+    store = TimesheetStore()
+    history = History(store)
+    history.add(738000, "A", 60)
+    history.undo()
+    history.add(738001, "B", 90)
+    assert not history.can_redo()
+    assert history.redo() is None
+
+
+def test_depth_limits_undo():
+    store = TimesheetStore()
+    history = History(store, depth=3)
+    for day in range(5):
+        history.add(738000 + day, "A", 60)
+    assert [history.undo() for _ in range(4)] == [("delete", 4), ("delete", 3), ("delete", 2), None]
+    assert len(store) == 2
@@ -0,0 +1,96 @@
+import random
+from datetime import date
+
+import numpy as np
+import pytest
+
+from importer import ImportReport, parse_batch, parse_clocks, parse_dates, parse_hour_values
+from timesheet import parse_clock, parse_date, parse_hours, parse_record
+
+# The vectorized parsers must give the same value, or the same error, as the
+# scalar ones in timesheet for every input
+
+BAD_DATES = ["31-02-2024", "29-02-2023", "00-01-2024", "01-13-2024", "01-00-2024", "32-01-2024", "aa-bb-cccc",
+             "", "01/02/2024", "01-02-24", "1-2-2024", "01-2-2024", "001-02-2024", "01--2-2024", "01-02-20x4",
+             "29-02-1900", "29-02-2000", "01-01-0001", "01-01-0000", "-1-01-2024", "٠١-٠٢-٢٠٢٤"]
+BAD_CLOCKS = ["24:00", "12:60", "7:5", "", "8", "08:00:00", "8.00", "-1:30", "+1:30", "ab:cd", "1:2:3", "08:0x",
+              "0:00", "00:00", "23:59", "9:59", "99:99", "08 :00", "８:00"]
+HOURS = ["7.5", "7,5", "8", "0", "0.01", "0.0083", "-2", "1e2", "NaN", "inf", "", "x", "7.50", "007.5"]
+
+
+def random_dates(count):
+    rng = random.Random(1)
+    ordinals = [rng.randint(date(1900, 1, 1).toordinal(), date(2100, 12, 31).toordinal()) for _ in range(count)]
+    return [date.fromordinal(day).strftime("%d-%m-%Y") for day in ordinals]
+
+
+def random_clocks(count):
+    rng = random.Random(2)
+    return [f"{rng.randint(0, 23):0{rng.choice((1, 2))}d}:{rng.randint(0, 59):02d}" for _ in range(count)]
+
+
+def scalar(parse, text):
+    try:
+        return parse(text), None
+    except ValueError as e:
+        return None, str(e)
+
+
+def check_same(vector_parse, parse, values):
+    result, ok, errors = vector_parse(np.array(values, dtype=str))
+    for i, text in enumerate(values):
+        value, error = scalar(parse, text)
+        if error is None:
+            assert ok[i], text
+            assert result[i] == value, text
+        else:
+            assert not ok[i], text
+            assert errors[i] == error, text
+
+
+def test_dates_agree():
+    check_same(parse_dates, parse_date, random_dates(2000) + BAD_DATES)
+
+
+def test_clocks_agree():
+    check_same(parse_clocks, parse_clock, random_clocks(2000) + BAD_CLOCKS)
+
+
+def test_hours_agree():
+    check_same(parse_hour_values, parse_hours, HOURS * 3)
+
+
+def record(day, start, end, pause="Nei", end_day=None, customer="Storgata 1"):
+    fields = {"Dato": day, "Kunde/Adresse": customer, "Starttid": start, "Sluttid": end, "Tok pause": pause}
+    return fields if end_day is None else dict(fields, Sluttdato=end_day)
+
+
+@pytest.mark.parametrize("records", [
+    [record("05-02-2024", "08:00", "16:00", "Ja"), record("05-02-2024", "22:00", "06:00"),
+     record("31-02-2024", "08:00", "16:00"), record("05-02-2024", "8:00", "25:00"), None],
+    [record("05-02-2024", "08:00", "10:00", end_day="07-02-2024"),
+     record("05-02-2024", "08:00", "10:00", end_day="03-02-2024"),
+     record("05-02-2024", "16:00", "08:00", end_day="05-02-2024"),
+     record("05-02-2024", "22:00", "06:00", "ja", end_day="06-02-2024"),
+     record("05-02-2024", "22:00", "06:00", end_day=""),
+     record("05-02-2024", "22:00", "06:00", end_day="xx")],
+    [{"Dato": "05-02-2024", "Kunde/Adresse": " A ", "Arbeidstid": "7,5"},
+     {"Dato": "05-02-2024", "Kunde/Adresse": "A", "Arbeidstid": "sju"}],
+])
+def test_batch_agrees_with_parse_record(records):
+    report = ImportReport()
+    lines = list(range(2, len(records) + 2))
+    batch = parse_batch(lines, records, report)
+    imported = [(int(day), str(batch.customer_names[code]), int(start), int(end), bool(pause), int(minutes))
+                for day, code, start, end, pause, minutes in zip(batch.days, batch.customer_codes, batch.starts,
+                                                                  batch.ends, batch.pauses, batch.minutes)]
+
+    expected, bad_lines = [], []
+    for line, fields in zip(lines, records):
+        try:
+            expected.append(tuple(parse_record(fields)))
+        except (ValueError, TypeError):
+            bad_lines.append(line)
+    assert imported == expected
+    assert sorted({line for line, _ in report.errors}) == bad_lines
+    assert report.imported == len(expected)
@@ -0,0 +1,72 @@
+import random
+
+from query import ShiftIndex
+from timesheet import History, MINUTES_PER_DAY, TimesheetStore
+
+FIRST_DAY = 738000
+
+
+def brute_rows(store, first, last, customer):
+    rows = [row for row in range(len(store))
+            if (first is None or store.days[row] >= first) and (last is None or store.days[row] <= last)
+            and (customer is None or store[row].customer == customer)]
+    return sorted(rows, key=lambda row: store.days[row])
+
+
+def check_index(index, store, rng):
+    for _ in range(5):
+        first = rng.choice([None, FIRST_DAY + rng.randrange(40)])
+        last = rng.choice([None, FIRST_DAY + rng.randrange(40)])
+        customer = rng.choice([None, "A", "B", "C", "missing"])
+        assert list(index.rows(first, last, customer)) == brute_rows(store, first, last, customer)
+    # An upper bound is enough for check_shift's look-back, removing a row does not lower it
+    longest = max((store.ends[row] // MINUTES_PER_DAY for row in range(len(store))), default=0)
+    assert index.longest_shift_days() >= longest
+
+
+def test_index_follows_edits():
+    # Appends, undo of the last row and arbitrary deletes / inserts, compared with a plain scan
+    rng = random.Random(4)
+    store = TimesheetStore()
+    history = History(store, depth=500)
+    index = ShiftIndex(store)
+    for _ in range(1500):
+        choice = rng.random()
+        if choice < 0.5 or not len(store):
+            start = rng.randrange(0, 1440, 30)
+            end = start + rng.choice([60, 480, 900, 2000, 4000])
+            history.add(FIRST_DAY + rng.randrange(40), rng.choice("ABC"), end - start, start=start, end=end)
+        elif choice < 0.65:
+            history.delete(rng.randrange(len(store)))
+        elif choice < 0.85:
+            history.undo()
+        else:
+            history.redo()
+        check_index(index, store, rng)
+
+
+def test_append_and_undo_keep_the_index():
+    # The common edits (add a row, undo it) must not cost a rebuild
+    store = TimesheetStore()
+    history = History(store)
+    for day in range(10):
+        history.add(FIRST_DAY + day, "A", 60, start=480, end=540)
+    index = ShiftIndex(store)
+    index.rows()
+    history.add(FIRST_DAY + 3, "B", 60, start=600, end=660)
+    assert not index.stale
+    assert list(index.rows(FIRST_DAY + 3, FIRST_DAY + 3)) == [3, 10]
+    history.undo()
+    assert not index.stale
+    assert list(index.rows(FIRST_DAY + 3, FIRST_DAY + 3)) == [3]
+    assert list(index.rows(customer="B")) == []
+
+
+def test_customer_summary():
+    store = TimesheetStore()
+    for day, customer, minutes in [(0, "A", 60), (1, "B", 30), (2, "A", 45), (5, "B", 10)]:
+        store.add(FIRST_DAY + day, customer, minutes)
+    index = ShiftIndex(store)
+    assert index.customer_summary() == {"A": 105, "B": 40}
+    assert index.customer_summary(FIRST_DAY + 1, FIRST_DAY + 2) == {"A": 45, "B": 30}
+    assert index.query(customer="A").total == 105
@@ -0,0 +1,365 @@
+import array
+from collections import deque, namedtuple
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import lru_cache
+
+# Columnar shift store shared by v1 and v2. Times are whole minutes everywhere;
+# decimal hours (v1) and H:MM (v2) are only text formats of the same number.
+# The formatters are cached because a sheet repeats the same few values
+# (days, 7.50 hours, 8:00) on every row and every redraw.
+
+Shift = namedtuple("Shift", ["day", "customer", "start", "end", "pause", "minutes"])
+
+NO_TIME = -1  # v1 only records the number of hours, no start/end
+PAUSE_MINUTES = 30
+MINUTES_PER_DAY = 1440
+
+SHIFT_COLUMNS = ["Dato", "Kunde/Adresse", "Starttid", "Sluttid", "Tok pause", "Arbeidstid"]
+
+
+def parse_date(text):
+    try:
+        day, month, year = map(int, text.split("-"))
+        return date(year, month, day).toordinal()
+    except ValueError:
+        raise ValueError("Invalid date format. Use DD-MM-YYYY.") from None
+
+
+FORMAT_CACHE = 4096
+
+
+@lru_cache(maxsize=FORMAT_CACHE)
+def format_date(ordinal):
+    return date.fromordinal(ordinal).strftime("%d-%m-%Y")
+
+
+def parse_clock(text):
+    try:
+        hours, minutes = map(int, text.split(":"))
+    except ValueError:
+        raise ValueError("Invalid time format. Use HH:MM or H:MM.") from None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError("Invalid time format. Use HH:MM or H:MM.")
+    return hours * 60 + minutes
+
+
+@lru_cache(maxsize=FORMAT_CACHE)
+def format_clock(minutes):
+    # End times are minutes from the start of the shift's day, 30:00 shows as 06:00+1
+    if minutes == NO_TIME:
+        return ""
+    days, minutes = divmod(minutes, MINUTES_PER_DAY)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}" + (f"+{days}" if days else "")
+
+
+def parse_duration(text):
+    try:
+        hours, minutes = map(int, text.split(":"))
+        return hours * 60 + minutes
+    except ValueError:
+        raise ValueError("Invalid time format. Use HH:MM.") from None
+
+
+@lru_cache(maxsize=FORMAT_CACHE)
+def format_duration(minutes):
+    return f"{int(minutes // 60)}:{int(minutes % 60):02d}"
+
+
+@lru_cache(maxsize=FORMAT_CACHE)
+def parse_hours(text):
+    # "7.5" or "7,5" hours -> 450 minutes, exactly; half a minute rounds up
+    try:
+        hours = Decimal(text.strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"Invalid number of hours: {text!r}") from None
+    if not hours.is_finite():
+        raise ValueError(f"Invalid number of hours: {text!r}")
+    return int((hours * 60).to_integral_value(ROUND_HALF_UP))
+
+
+@lru_cache(maxsize=FORMAT_CACHE)
+def format_hours(minutes):
+    # 450 -> "7.50"; minutes * 100 / 60 never ends in exactly .5, so rounding has no ties
+    sign = "-" if minutes < 0 else ""
+    hours, hundredths = divmod((abs(minutes) * 10 + 3) // 6, 100)
+    return f"{sign}{hours}.{hundredths:02d}"
+
+
+def shift_end(start, end):
+    # An end time before the start time is on the next day (night shift)
+    return end + MINUTES_PER_DAY if end < start else end
+
+
+def work_minutes(start, end, pause):
+    return shift_end(start, end) - start - (PAUSE_MINUTES if pause else 0)
+
+
+def shift_end_on(day, start, end, end_day=None):
+    # End as minutes from the start of day. Without an end day (Sluttdato) an
+    # end before the start is on the next day; an end day must not be before
+    # day, and on the same day the end must not be before the start
+    if end_day is None:
+        return shift_end(start, end)
+    if end_day < day:
+        raise ValueError("Earlier than Dato.")
+    end += (end_day - day) * MINUTES_PER_DAY
+    if end < start:
+        raise ValueError("Same day as Dato, but Sluttid is before Starttid.")
+    return end
+
+
+YES = ("ja", "yes", "1", "true")
+
+
+def _field(parse, record, name):
+    try:
+        return parse((record[name] or "").strip())
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}") from None
+
+
+def parse_record(record):
+    # Shift of one CSV / JSON record with the v2 columns (Dato, Kunde/Adresse,
+    # Starttid, Sluttid, Tok pause, optional Sluttdato) or the v1 ones (Dato,
+    # Kunde/Adresse, Arbeidstid). Every command reads records with this; the
+    # importer's vectorized path follows the same rules.
+    # KeyError for a missing column, ValueError "Column: message" for a bad value
+    day = _field(parse_date, record, "Dato")
+    customer = (record["Kunde/Adresse"] or "").strip()
+    if "Starttid" not in record and "Arbeidstid" in record:
+        return Shift(day, customer, NO_TIME, NO_TIME, False, _field(parse_hours, record, "Arbeidstid"))
+    start = _field(parse_clock, record, "Starttid")
+    end = _field(parse_clock, record, "Sluttid")
+    end_day = _field(parse_date, record, "Sluttdato") if (record.get("Sluttdato") or "").strip() else None
+    try:
+        end = shift_end_on(day, start, end, end_day)
+    except ValueError as e:
+        raise ValueError(f"Sluttdato: {e}") from None
+    pause = (record.get("Tok pause") or "").strip().lower() in YES
+    return Shift(day, customer, start, end, pause, end - start - (PAUSE_MINUTES if pause else 0))
+
+
+def shift_row(shift):
+    # One row of the v2 table (Treeview and PDF)
+    return [format_date(shift.day), shift.customer, format_clock(shift.start), format_clock(shift.end),
+            'Ja' if shift.pause else 'Nei', format_duration(shift.minutes)]
+
+
+def shift_table_data(shifts, total_minutes):
+    table_data = [list(SHIFT_COLUMNS)]
+    for shift in shifts:
+        table_data.append(shift_row(shift))
+    table_data.append(["Sum Timer", "", "", "", "", format_duration(total_minutes)])
+    return table_data
+
+
+class Totals:
+    # Running sums in minutes, kept up to date on every add and delete
+    def __init__(self):
+        self.total = 0
+        self.by_day = {}
+        self.by_customer = {}
+        self.by_week = {}
+
+    def add(self, day, customer_id, minutes):
+        self.total += minutes
+        self._bump(self.by_day, day, minutes)
+        self._bump(self.by_customer, customer_id, minutes)
+        self._bump(self.by_week, week_of(day), minutes)
+
+    def remove(self, day, customer_id, minutes):
+        self.add(day, customer_id, -minutes)
+
+    def add_sums(self, day_sums, customer_sums):
+        # Bulk version of add() for already grouped minutes {day: minutes}, {customer_id: minutes}
+        for day, minutes in day_sums.items():
+            self.total += minutes
+            self._bump(self.by_day, day, minutes)
+            self._bump(self.by_week, week_of(day), minutes)
+        for customer_id, minutes in customer_sums.items():
+            self._bump(self.by_customer, customer_id, minutes)
+
+    def _bump(self, sums, key, minutes):
+        value = sums.get(key, 0) + minutes
+        if value:
+            sums[key] = value
+        else:
+            sums.pop(key, None)
+
+
+def week_of(day):
+    year, week, _ = date.fromordinal(day).isocalendar()
+    return year, week
+
+
+class TimesheetStore:
+    def __init__(self):
+        self.days = array.array("i")
+        self.customers = array.array("i")
+        self.starts = array.array("i")
+        self.ends = array.array("i")
+        self.pauses = array.array("b")
+        self.minutes = array.array("i")
+
+        # Every address is stored once, the column only holds its number
+        self.customer_names = []
+        self._customer_ids = {}
+
+        self.totals = Totals()
+        self.listeners = []
+
+    def subscribe(self, callback):
+        # callback(action, index) is called after every row insert or delete,
+        # and with ("extend", first_new_index) after a bulk append
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        self.listeners.remove(callback)
+
+    def copy(self):
+        # Independent copy without listeners, e.g. to check the rows in another process
+        store = TimesheetStore()
+        for name in ("days", "customers", "starts", "ends", "pauses", "minutes"):
+            setattr(store, name, array.array(getattr(self, name).typecode, getattr(self, name)))
+        store.customer_names = list(self.customer_names)
+        store._customer_ids = dict(self._customer_ids)
+        store.totals.total = self.totals.total
+        store.totals.by_day = dict(self.totals.by_day)
+        store.totals.by_customer = dict(self.totals.by_customer)
+        store.totals.by_week = dict(self.totals.by_week)
+        return store
+
+    def _notify(self, action, index):
+        for callback in self.listeners:
+            callback(action, index)
+
+    def intern_customer(self, name):
+        customer_id = self._customer_ids.get(name)
+        if customer_id is None:
+            customer_id = len(self.customer_names)
+            self.customer_names.append(name)
+            self._customer_ids[name] = customer_id
+        return customer_id
+
+    def add(self, day, customer, minutes, start=NO_TIME, end=NO_TIME, pause=False):
+        return self.insert(len(self.days), day, customer, start, end, pause, minutes)
+
+    def insert(self, index, day, customer, start, end, pause, minutes):
+        # Same argument order as Shift, so insert(index, *shift) restores a row
+        customer_id = self.intern_customer(customer)
+        self.days.insert(index, day)
+        self.customers.insert(index, customer_id)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.pauses.insert(index, 1 if pause else 0)
+        self.minutes.insert(index, minutes)
+        self.totals.add(day, customer_id, minutes)
+        self._notify("insert", index)
+        return index
+
+    def extend(self, days, customer_ids, starts, ends, pauses, minutes, day_sums=None, customer_sums=None):
+        # Bulk append of whole columns (array.array with the same typecodes as the store).
+        # Callers that already grouped the minutes pass day_sums / customer_sums.
+        first = len(self.days)
+        if day_sums is None:
+            day_sums, customer_sums = {}, {}
+            for day, customer_id, value in zip(days, customer_ids, minutes):
+                day_sums[day] = day_sums.get(day, 0) + value
+                customer_sums[customer_id] = customer_sums.get(customer_id, 0) + value
+
+        self.days.extend(days)
+        self.customers.extend(customer_ids)
+        self.starts.extend(starts)
+        self.ends.extend(ends)
+        self.pauses.extend(pauses)
+        self.minutes.extend(minutes)
+        self.totals.add_sums(day_sums, customer_sums)
+        self._notify("extend", first)
+        return first
+
+    def delete(self, index):
+        shift = self[index]
+        self.totals.remove(self.days[index], self.customers[index], self.minutes[index])
+        for column in (self.days, self.customers, self.starts, self.ends, self.pauses, self.minutes):
+            del column[index]
+        self._notify("delete", index)
+        return shift
+
+    def customer_id(self, name):
+        return self._customer_ids.get(name)
+
+    def customer_total(self, name):
+        customer_id = self._customer_ids.get(name)
+        return self.totals.by_customer.get(customer_id, 0)
+
+    def day_total(self, day):
+        return self.totals.by_day.get(day, 0)
+
+    def week_total(self, day):
+        return self.totals.by_week.get(week_of(day), 0)
+
+    def __len__(self):
+        return len(self.days)
+
+    def __getitem__(self, index):
+        return Shift(self.days[index], self.customer_names[self.customers[index]], self.starts[index],
+                     self.ends[index], bool(self.pauses[index]), self.minutes[index])
+
+    def __iter__(self):
+        names = self.customer_names
+        for day, customer, start, end, pause, minutes in zip(self.days, self.customers, self.starts,
+                                                             self.ends, self.pauses, self.minutes):
+            yield Shift(day, names[customer], start, end, bool(pause), minutes)
+
+
+class History:
+    # Undo/redo as a log of single-row operations instead of copies of the whole table
+    def __init__(self, store, depth=100):
+        self.store = store
+        self.undo_log = deque(maxlen=depth)
+        self.redo_log = deque(maxlen=depth)
+
+    def add(self, day, customer, minutes, start=NO_TIME, end=NO_TIME, pause=False):
+        index = self.store.add(day, customer, minutes, start=start, end=end, pause=pause)
+        self._record(("insert", index, self.store[index]))
+        return index
+
+    def delete(self, index):
+        shift = self.store.delete(index)
+        self._record(("delete", index, shift))
+        return shift
+
+    def _record(self, operation):
+        self.undo_log.append(operation)
+        self.redo_log.clear()
+
+    def _apply(self, action, index, shift):
+        if action == "insert":
+            self.store.insert(index, *shift)
+        else:
+            self.store.delete(index)
+
+    def undo(self):
+        # Returns (action, index) describing what happened to the store, or None
+        if not self.undo_log:
+            return None
+        action, index, shift = self.undo_log.pop()
+        inverse = "delete" if action == "insert" else "insert"
+        self._apply(inverse, index, shift)
+        self.redo_log.append((action, index, shift))
+        return inverse, index
+
+    def redo(self):
+        if not self.redo_log:
+            return None
+        action, index, shift = self.redo_log.pop()
+        self._apply(action, index, shift)
+        self.undo_log.append((action, index, shift))
+        return action, index
+
+    def can_undo(self):
+        return bool(self.undo_log)
+
+    def can_redo(self):
+        return bool(self.redo_log)
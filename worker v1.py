@@ -1,100 +1,107 @@
-import os
 from tkinter import Tk, Label, Button, filedialog, ttk, messagebox, Entry
-from PIL import Image, ImageTk
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
 import tkinter as tk
 import sys
-import fitz  # PyMuPDF
-from copy import deepcopy  # Dodano import do obsługi głębokiej kopii
-
-styles = getSampleStyleSheet()
+from timesheet import TimesheetStore, History, NO_TIME, parse_date, parse_hours, format_date, format_hours
+from table_view import TreeviewModel, VirtualTreeviewModel, VIRTUAL_ROWS
+from jobs import JobScheduler
+from frames import FrameScheduler, StatusBar, fit_columns
+from query import ShiftIndex
+import overlaps
+import metrics
+import assets
 
 
 class WorkingHoursTable:
-    def __init__(self):
-        self.data = []
-        self.sum_hours = 0
+    def __init__(self, session_path=None):
+        self.data = TimesheetStore()
+        self.session = None
+        if session_path:
+            from storage import open_session
+            self.session = open_session(session_path, self.data)  # Every change is written to disk right away
+        self.autosave = None  # without a session, see EmployeeProgram.start_autosave
         self.table_header = ""
-        self.history = []  # Dodano pole do przechowywania historii stanów tabeli
+        self.history = History(self.data)  # Dziennik operacji do cofania i ponawiania
+        self.index = ShiftIndex(self.data)
+        self.page_cache = None  # rendered PDF pages, only changed pages are rebuilt on the next save
 
-    def add_record(self, date, client_address, working_hours):
-        # Zapisz aktualny stan tabeli przed dodaniem nowego wpisu
-        self.history.append(deepcopy(self.data))
+    @property
+    def sum_hours(self):
+        return self.data.totals.total / 60
 
-        entry = {
-            "Dato": date,
-            "Kunde/Adresse": client_address,
-            "Arbeidstid": working_hours
-        }
-        self.data.append(entry)
-        self.sum_hours += float(working_hours)
+    def add_record(self, date, client_address, working_hours):
+        with metrics.span("add"):
+            self.history.add(parse_date(date), client_address, parse_hours(working_hours))
+
+    def check_record(self, date, client_address, working_hours):
+        # Text describing what is wrong with the record compared to the table, or ''
+        problems = overlaps.check_shift(self.data, self.index, parse_date(date), client_address, NO_TIME, NO_TIME,
+                                        False, parse_hours(working_hours))
+        return "\n".join(f"{overlaps.RELATION[kind].capitalize()} {overlaps.describe_shift(self.data, row)}"
+                         for kind, row in problems)
+
+    def check_table(self, store=None, problems=None):
+        # store / problems: a copy of the table that was already checked in another process
+        store = self.data if store is None else store
+        problems = overlaps.find_problems(store) if problems is None else problems
+        if not problems:
+            return ''
+        return f"{len(problems)} duplicate or overlapping rows:\n" + overlaps.summary(store, problems)
+
+    def delete_record(self, index):
+        return self.history.delete(index)
 
     def calculate_total_working_hours(self):
-        total_hours = sum(float(entry["Arbeidstid"]) for entry in self.data)
-        return total_hours
+        return self.sum_hours
+
+    def row(self, entry):
+        return [format_date(entry.day), entry.customer, format_hours(entry.minutes)]
+
+    def header_rows(self):
+        return [["", self.table_header, ""], ["Dato", "Kunde/Adresse", "Arbeidstid"]]
+
+    def sum_row(self):
+        return ["", "Sum Timer", format_hours(self.data.totals.total)]
 
     def prepare_table_data(self):
-        table_data = [["", self.table_header, ""], ["Dato", "Kunde/Adresse", "Arbeidstid"]]
+        table_data = self.header_rows()
         for entry in self.data:
-            table_data.append(list(entry.values()))
-        sum_row = ["", "Sum Timer", f"{self.sum_hours:.2f}"]
-        table_data.append(sum_row)
+            table_data.append(self.row(entry))
+        table_data.append(self.sum_row())
         return table_data
 
     def add_table_style(self, table):
-        style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -2), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)])
-
-        green_style = TableStyle([
-            ('BACKGROUND', (-1, -1), (-1, -1), colors.green),
-            ('TEXTCOLOR', (-1, -1), (-1, -1), colors.white)])
-
-        table.setStyle(style)
-        table.setStyle(green_style)
+        import pdf_export
+        pdf_export.apply_table_style(table)
 
     def create_header(self):
-        return Paragraph(self.table_header, styles['Title'])
-
-    def save_table_to_pdf(self, filename):
-        doc = SimpleDocTemplate(filename, pagesize=letter)
-        data = self.prepare_table_data()
-        table = Table(data)
-        self.add_table_style(table)
-
-        elements = [table]
-        if self.table_header:
-            elements.insert(0, self.create_header())
-
-        doc.build(elements)
-
-    def convert_pdf_to_jpg(self, pdf_filename, output_folder, quality=95):
-        try:
-            pdf_document = fitz.open(pdf_filename)
-            number_of_pages = pdf_document.page_count
-
-            for page_number in range(number_of_pages):
-                page = pdf_document[page_number]
-                pixmap = page.get_pixmap()
-                image = Image.frombytes("RGB", [pixmap.width, pixmap.height], pixmap.samples)
-                image_path = os.path.join(output_folder, f"page_{page_number + 1}.jpg")
-
-                try:
-                    image.save(image_path, "JPEG", quality=quality)
-                except Exception as e:
-                    print(f"Error saving page {page_number + 1}: {e}")
-
-            messagebox.showinfo('Success', 'PDF converted to JPG.')
-        except Exception as e:
-            messagebox.showerror('Error', f'Error converting PDF to JPG: {e}')
+        import pdf_export
+        return pdf_export.create_header(self.table_header)
+
+    def save_table_to_pdf(self, filename, data=None, progress=None):
+        # data is passed in when the PDF is built on a worker thread, so the
+        # rows are read on the Tk thread only
+        import pdf_export
+        if data is None:
+            data = self.prepare_table_data()
+        if self.page_cache is None:
+            self.page_cache = pdf_export.PageCache()
+        pdf_export.build_pdf_cached(filename, data, self.table_header, self.page_cache, header_rows=2,
+                                    progress=progress)
+
+    def save_table_to_images(self, filename, data=None, progress=None):
+        # PNG / JPG / WebP pages and thumbnails straight from memory, no PDF file in between
+        import pdf_export
+        from image_export import export_images
+        if data is None:
+            data = self.prepare_table_data()
+        if self.page_cache is None:
+            self.page_cache = pdf_export.PageCache()
+        return export_images(filename, data, self.table_header, self.page_cache, header_rows=2, progress=progress)
+
+    def convert_pdf_to_jpg(self, pdf_filename, output_folder, quality=95, dpi=72, progress=None):
+        # Runs on a worker thread, errors are reported by EmployeeProgram
+        from rasterizer import rasterize_pdf
+        return rasterize_pdf(pdf_filename, output_folder, dpi=dpi, quality=quality, progress=progress)
 
     def on_exit(self):
         if self.data:
@@ -105,7 +112,7 @@ class WorkingHoursTable:
 
 
 class EmployeeProgram:
-    def __init__(self, master):
+    def __init__(self, master, virtual=False, session_path=None):
         self.master = master
         master.title("WojThmas Soft beta 1.1 Gamon Patrol version")
         master.geometry("1005x800")
@@ -113,12 +120,36 @@ class EmployeeProgram:
         self.table_choice = tk.IntVar()
         self.table_choice.set(1)  # Domyślnie wybierz tabelę "Working Hours v1"
 
-        self.working_hours_table = WorkingHoursTable()
+        try:
+            self.working_hours_table = WorkingHoursTable(session_path)
+        except ValueError as e:
+            messagebox.showerror('Error', f'{e}\nStarting with an empty table.')
+            self.working_hours_table = WorkingHoursTable()
+        if self.working_hours_table.session is None:
+            self.start_autosave()
+        # Only the visible rows are kept in the Treeview
+        self.virtual = virtual or len(self.working_hours_table.data) > VIRTUAL_ROWS
+        self.jobs = JobScheduler(master)
+        self.frames = FrameScheduler(master)  # Resize and label updates at most once per frame
 
         self.author_information = "Program developed by: [Wojciech K. and Thomas O. Polish-Norwegian grammar mistakes are intentional :) Program version 1.1 for patrol gamers]"
 
         self.create_interface()
 
+    def start_autosave(self):
+        # The table is saved in the background and offered back on the next start
+        import autosave
+        from storage import default_session_path
+        path = default_session_path("autosave-v1")
+        table = self.working_hours_table
+        found = autosave.find(path)
+        if found and messagebox.askyesno('Recover', f'{found[0]} rows from {found[1]} were not saved. Recover them?'):
+            try:
+                autosave.restore(path, table.data)
+            except (OSError, ValueError) as e:
+                messagebox.showerror('Error', f'Could not recover the rows: {e}')
+        table.autosave = autosave.Autosave(self.master, table.data, path)
+
     def create_interface(self):
         top_frame = tk.Frame(self.master)
         top_frame.pack(side=tk.TOP, pady=10, fill=tk.X)
@@ -140,22 +171,10 @@ class EmployeeProgram:
         self.header_entry.grid(row=len(labels) + 1, column=1, pady=5, padx=10, sticky="w")
 
         # Dodanie logo
-        logo_path = "logo.png"  # Zmienić na nazwę pliku PNG z logo
-        if getattr(sys, 'frozen', False):
-            # Aplikacja jest zamrożona (skompilowana do .exe)
-            logo_full_path = os.path.join(os.path.dirname(sys.argv[0]), logo_path)
-        else:
-            # Aplikacja nie jest zamrożona
-            logo_full_path = os.path.join(os.path.dirname(__file__), logo_path)
-
-        if os.path.exists(logo_full_path):
-            self.logo_image = Image.open(logo_full_path)
-            self.logo_image.thumbnail((250, 250))
-            self.logo_image = ImageTk.PhotoImage(self.logo_image)
+        self.logo_image = assets.logo()
+        if self.logo_image is not None:
             logo_label = tk.Label(top_frame, image=self.logo_image)
             logo_label.grid(row=2, column=6, rowspan=6, padx=(200, 10), sticky="e")
-        else:
-            print(f"File not found: {logo_full_path}")
 
         buttons_frame = tk.Frame(top_frame)
         buttons_frame.grid(row=len(labels) + 4, column=0, columnspan=2, pady=10)
@@ -175,10 +194,27 @@ class EmployeeProgram:
         tk.Button(buttons_frame, text='Info', command=self.show_info, font=("Arial", 12)).grid(row=0, column=4)
         tk.Button(buttons_frame, text='Undo', command=self.undo,
                   font=("Arial", 12)).grid(row=0, column=5)
+        tk.Button(buttons_frame, text='Redo', command=self.redo,
+                  font=("Arial", 12)).grid(row=0, column=6)
+        tk.Button(buttons_frame, text='Delete Row', command=self.delete_row,
+                  font=("Arial", 12)).grid(row=0, column=7)
+        self.cancel_button = tk.Button(buttons_frame, text='Cancel', command=self.jobs.cancel_all,
+                                       font=("Arial", 12), state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=8)
+        tk.Button(buttons_frame, text='Import File', command=self.import_file,
+                  font=("Arial", 12)).grid(row=1, column=0)
+        tk.Button(buttons_frame, text='Save as Image', command=self.save_table_to_images,
+                  font=("Arial", 12)).grid(row=1, column=2)
+
+        self.status_label = tk.Label(top_frame, text='', font=("Arial", 10), fg="gray")
+        self.status_label.grid(row=len(labels) + 5, column=0, columnspan=2, padx=10, sticky="w")
 
         self.create_table()
 
     def create_table(self):
+        self.status_bar = StatusBar(self.master)
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+
         table_frame = tk.Frame(self.master)
         table_frame.pack(side=tk.LEFT, pady=10, fill=tk.BOTH, expand=True)
 
@@ -193,18 +229,22 @@ class EmployeeProgram:
         for header in column_headers:
             self.tree.heading(header, text=header)
 
-        column_widths = [100, 100, 150]
-        for i, width in enumerate(column_widths):
+        self.column_widths = [100, 100, 150]
+        for i, width in enumerate(self.column_widths):
             self.tree.column(column_headers[i], width=width)
 
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(table_frame, orient="vertical")
+        self.scrollbar.pack(side="right", fill="y")
+        self.create_table_view()
 
-        self.master.bind("<Configure>", lambda event: self.update_columns(event))
+        self.master.bind("<Configure>", self.on_configure)
         self.master.bind("<Control-s>", lambda event: self.save_table_to_pdf())
+        self.master.bind("<Control-z>", lambda event: self.undo())
+        self.master.bind("<Control-y>", lambda event: self.redo())
+        if metrics.enabled:
+            self.master.bind("<F12>", lambda event: metrics.open_panel(self.master))
 
         self.working_hours_table.row_height = int(self.tree.winfo_reqheight() / 30)
 
@@ -212,83 +252,212 @@ class EmployeeProgram:
                                           font=("Arial", 14, "bold"), fg="blue")
         self.label_total_hours.pack(side=tk.RIGHT, pady=10, padx=10)
 
-    def update_columns(self, event=None):
-        tree_width = self.tree.winfo_width()
-        total_width = sum([self.tree.column(c)["width"] for c in self.tree["columns"]])
-        factor = tree_width / total_width if total_width > 0 else 1
+    def create_table_view(self):
+        table = self.working_hours_table
+        view_class = VirtualTreeviewModel if self.virtual else TreeviewModel
+        self.table_view = view_class(self.tree, table.data, table.row,
+                                     header_rows=table.header_rows(), sum_row=table.sum_row,
+                                     scheduler=self.frames)
+        self.table_view.attach_scrollbar(self.scrollbar)
+
+    def use_virtual_table(self):
+        # A big import into a small sheet: from now on only the visible rows are in the Treeview
+        self.table_view.detach()
+        self.virtual = True
+        self.create_table_view()
+
+    def on_configure(self, event):
+        # <Configure> on the root also arrives for every child widget
+        if event.widget is self.master:
+            self.frames.debounce("resize", self.update_columns)
 
-        for c in self.tree["columns"]:
-            self.tree.column(c, width=int(self.tree.column(c)["width"] * factor))
+    def update_columns(self, event=None):
+        fit_columns(self.tree, self.column_widths)
 
     def save_table_to_pdf(self, event=None):
-        try:
-            file_name = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Files", "*.pdf")])
-            if file_name:
-                self.working_hours_table.table_header = self.header_entry.get()
-                self.working_hours_table.save_table_to_pdf(file_name)
-                messagebox.showinfo('Success', 'Table and sum saved as PDF.')
-        except Exception as e:
-            messagebox.showerror('Error', f'Error saving PDF: {e}')
+        file_name = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Files", "*.pdf")])
+        if file_name:
+            self.working_hours_table.table_header = self.header_entry.get()
+            self.table_view.set_header_rows(self.working_hours_table.header_rows())
+            self.start_job('PDF', self.working_hours_table.save_table_to_pdf, file_name,
+                           self.working_hours_table.prepare_table_data(),
+                           message='Table and sum saved as PDF.', error='Error saving PDF')
+
+    def save_table_to_images(self):
+        file_name = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[
+            ("PNG", "*.png"), ("JPEG", "*.jpg"), ("WebP", "*.webp")])
+        if file_name:
+            self.working_hours_table.table_header = self.header_entry.get()
+            self.table_view.set_header_rows(self.working_hours_table.header_rows())
+            self.start_job('Image', self.working_hours_table.save_table_to_images, file_name,
+                           self.working_hours_table.prepare_table_data(),
+                           message='Table saved as images.', error='Error saving images')
 
     def convert_pdf_to_jpg(self):
-        try:
-            pdf_file_name = filedialog.askopenfilename(filetypes=[("PDF Files", "*.pdf")])
-            if not pdf_file_name:
-                return
+        pdf_file_name = filedialog.askopenfilename(filetypes=[("PDF Files", "*.pdf")])
+        if not pdf_file_name:
+            return
+
+        output_folder = filedialog.askdirectory()
+        if not output_folder:
+            return
+
+        self.start_job('JPG', self.working_hours_table.convert_pdf_to_jpg, pdf_file_name, output_folder,
+                       error='Error converting PDF to JPG', on_done=self.jpg_finished)
+
+    def jpg_finished(self, failed):
+        # failed: page numbers (from 1) that could not be saved
+        if failed:
+            messagebox.showwarning('JPG', f"PDF converted to JPG, but {len(failed)} pages could not be saved: "
+                                          f"{', '.join(map(str, failed))}")
+        else:
+            messagebox.showinfo('Success', 'PDF converted to JPG.')
 
-            output_folder = filedialog.askdirectory()
-            if not output_folder:
-                return
+    def start_job(self, name, function, *args, message=None, error, on_done=None, unit='page', process=False):
+        def done(job, result):
+            self.job_finished()
+            if on_done:
+                on_done(result)
+            else:
+                messagebox.showinfo('Success', message)
+
+        def failed(job, e):
+            self.job_finished()
+            metrics.count(f"errors.{name}")
+            messagebox.showerror('Error', f'{error}: {e}')
+
+        self.status_label.config(text=f'{name}...')
+        self.cancel_button.config(state=tk.NORMAL)
+        self.jobs.submit(name, function, *args, process=process, on_done=done, on_error=failed,
+                         on_progress=lambda job, done, total: self.show_progress(job, done, total, unit),
+                         on_cancel=lambda job: self.job_finished())
+
+    def show_progress(self, job, done, total, unit='page'):
+        if total:
+            self.status_label.config(text=f'{job.name}: {unit} {done} of {total}')
+        else:
+            self.status_label.config(text=f'{job.name}: {unit} {done}')
+
+    def import_file(self):
+        file_name = filedialog.askopenfilename(filetypes=[("CSV / JSON Lines / PDF", "*.csv *.jsonl *.pdf"),
+                                                          ("All files", "*.*")])
+        if file_name:
+            from importer import read_file
+            # The file is parsed on a worker thread, the rows are added on the Tk thread
+            self.start_job('Import', read_file, file_name, error='Error importing file',
+                           on_done=self.import_finished, unit='rows')
+
+    def import_finished(self, result):
+        from importer import apply_batch
+        batches, report = result
+        table = self.working_hours_table
+        if not self.virtual and len(table.data) + sum(len(batch.days) for batch in batches) > VIRTUAL_ROWS:
+            self.use_virtual_table()
+        with metrics.span("import"):
+            for batch in batches:
+                apply_batch(table.data, batch)
+        metrics.count("import.rows", report.imported)
+        self.show_total_working_hours()
+
+        # The overlap sweep takes seconds for a million rows, so it runs on a copy in another process
+        copy = table.data.copy()
+        self.start_job('Check', overlaps.find_problems, copy, process=True, error='Error checking the table',
+                       on_done=lambda problems: self.check_finished(report, copy, problems))
+
+    def check_finished(self, report, store, problems):
+        problems = self.working_hours_table.check_table(store, problems)
+        if report.errors or problems:
+            messagebox.showwarning('Import', '\n\n'.join(text for text in (report.summary(), problems) if text))
+        else:
+            messagebox.showinfo('Import', report.summary())
 
-            self.working_hours_table.convert_pdf_to_jpg(pdf_file_name, output_folder)
-            messagebox.showinfo('Success', 'PDF converted to JPG.')
-        except Exception as e:
-            messagebox.showerror('Error', f'Error converting PDF to JPG: {e}')
+    def job_finished(self):
+        if not self.jobs.running():
+            self.status_label.config(text='')
+            self.cancel_button.config(state=tk.DISABLED)
 
     def add_to_table(self):
         date, client_address, working_hours = [entry.get() for entry in
                                                (self.date_entry, self.client_address_entry, self.working_hours_entry)]
 
         try:
+            problems = self.working_hours_table.check_record(date, client_address, working_hours)
             self.working_hours_table.add_record(date, client_address, working_hours)
-            self.update_table(self.working_hours_table)
-            self.show_total_working_hours()
         except ValueError as e:
-            messagebox.showerror('Error', str(e))
+            self.status_bar.show(str(e), "error")
+            return
+        self.show_total_working_hours()
+        if problems:
+            self.status_bar.show('Added. ' + problems.replace('\n', '; ') + ' (Ctrl+Z to undo)', "warning")
+        else:
+            self.status_bar.show(f'Added {date} {client_address}', "ok")
 
     def show_total_working_hours(self):
-        total_hours = self.working_hours_table.calculate_total_working_hours()
-        self.label_total_hours.config(
-            text=f'Total working hours: {total_hours:.2f} hours')
+        self.frames.request("total", self.update_total_label)
+
+    def update_total_label(self):
+        with metrics.span("total"):
+            total_minutes = self.working_hours_table.data.totals.total
+            self.label_total_hours.config(
+                text=f'Total working hours: {format_hours(total_minutes)} hours')
 
     def show_info(self):
         messagebox.showinfo('Information', self.author_information)
 
-    def update_table(self, table_object):
-        self.tree.delete(*self.tree.get_children())
-        data = table_object.prepare_table_data()
-        for entry in data:
-            self.tree.insert("", "end", values=entry)
-
     def undo(self):
-        if len(self.working_hours_table.history) > 1:
-            # Pobierz poprzednią wersję tabeli z historii
-            previous_state = self.working_hours_table.history.pop()
-            self.working_hours_table.data = previous_state
-            self.update_table(self.working_hours_table)
+        if self.working_hours_table.history.undo():
             self.show_total_working_hours()
 
+    def redo(self):
+        if self.working_hours_table.history.redo():
+            self.show_total_working_hours()
+
+    def delete_row(self):
+        selected = self.tree.selection()
+        if not selected:
+            self.status_bar.show('Select a row to delete.', "warning")
+            return
+
+        index = self.table_view.index_of(selected[0])
+        if index is None:
+            return
+
+        self.working_hours_table.delete_record(index)
+        self.show_total_working_hours()
+
     def on_exit(self):
-        if self.working_hours_table.data:
-            response = messagebox.askyesno('Warning', 'Are you sure you want to exit? Unsaved data will be lost.')
+        # Every question first: after a "No" the program must keep working
+        if self.jobs.running():
+            if not messagebox.askyesno('Warning', 'An export is still running. Cancel it and exit?'):
+                return
+        if not self.working_hours_table.session and self.working_hours_table.data:
+            response = messagebox.askyesno('Warning', 'Are you sure you want to exit? The table is not saved, '
+                                                      'it can be recovered at the next start.')
             if not response:
                 return
+
+        self.jobs.shutdown()
+        if metrics.enabled:
+            from storage import default_session_path
+            metrics.write(default_session_path("metrics-v1.json"))
+        if self.working_hours_table.session:
+            self.working_hours_table.session.close()
+        if self.working_hours_table.autosave:
+            self.working_hours_table.autosave.close(keep=bool(self.working_hours_table.data))
         self.master.destroy()
 
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # rasterizer worker processes in the .exe build
+    if len(sys.argv) > 1 and not sys.argv[1].startswith("-"):
+        # Command line mode, e.g. "worker v1.py" total shifts.csv - no window is created
+        import cli
+        sys.exit(cli.main())
+    from storage import session_path
+    metrics.configure(sys.argv)  # --metrics / --metrics-port PORT, F12 shows the slowest operations
     root = Tk()
-    program = EmployeeProgram(root)
+    program = EmployeeProgram(root, virtual="--virtual" in sys.argv, session_path=session_path(sys.argv, "v1.db"))
     root.protocol("WM_DELETE_WINDOW", program.on_exit)
     root.mainloop()
 
@@ -1,126 +1,164 @@
-import os
 import sys
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-from PIL import Image, ImageTk
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from datetime import datetime, timedelta
-import fitz  # PyMuPDF
+from datetime import datetime
 from tkinter.simpledialog import askstring
-
-styles = getSampleStyleSheet()
+from timesheet import (TimesheetStore, History, parse_date, parse_clock, parse_duration, work_minutes, shift_end,
+                       shift_row, shift_table_data)
+from table_view import TreeviewModel, VirtualTreeviewModel, VIRTUAL_ROWS
+from jobs import JobScheduler
+from frames import FrameScheduler, StatusBar, fit_columns
+from query import ShiftIndex
+import overlaps
+import metrics
+import assets
 
 
 class Ansatt:
-    def __init__(self):
-        self.data = []
-        self.sum_timer = 0
+    def __init__(self, økt=None):
+        self.data = TimesheetStore()
+        self.økt = None
+        if økt:
+            from storage import open_session
+            self.økt = open_session(økt, self.data)  # Hver endring skrives til disk med en gang
+        self.autosave = None  # uten økt, se AnsattProgram.start_autosave
+        self.historikk = History(self.data)
+        self.indeks = ShiftIndex(self.data)
+        self.page_cache = None  # rendered PDF pages, only changed pages are rebuilt on the next save
         self.table_header = ""
 
+    @property
+    def sum_timer(self):
+        return self.data.totals.total
+
     def legg_til_opptegnelse(self, dato, kunde_adresse, start_tid, slutt_tid, tok_pause, arbeidstid):
-        oppføring = {
-            "Dato": dato,
-            "Kunde/Adresse": kunde_adresse,
-            "Starttid": start_tid,
-            "Sluttid": slutt_tid,
-            "Tok pause": tok_pause,
-            "Arbeidstid": arbeidstid
-        }
-        self.data.append(oppføring)
-        self.sum_timer += self.tid_til_minutter(arbeidstid)
+        with metrics.span("add"):
+            start = parse_clock(start_tid)
+            # arbeidstid er minutter, eller tekst H:MM fra eldre kall
+            minutter = arbeidstid if isinstance(arbeidstid, int) else self.tid_til_minutter(arbeidstid)
+            self.historikk.add(parse_date(dato), kunde_adresse, minutter,
+                               start=start, end=shift_end(start, parse_clock(slutt_tid)), pause=tok_pause == 'Ja')
+
+    def sjekk_opptegnelse(self, dato, kunde_adresse, start, slutt, tok_pause, arbeidstid):
+        # Tekst om hva som kolliderer med tabellen, eller ''. En sluttid før
+        # starttiden blir et nattskift, men kan like gjerne være en skrivefeil
+        problemer = overlaps.check_shift(self.data, self.indeks, parse_date(dato), kunde_adresse, start,
+                                         shift_end(start, slutt), tok_pause, arbeidstid)
+        tekst = {overlaps.DUPLICATE: "Dobbel av", overlaps.OVERLAP: "Overlapper med"}
+        linjer = ["Sluttid før starttid, lagt inn som nattskift til neste dag"] if slutt < start else []
+        linjer += [f"{tekst[art]} {overlaps.describe_shift(self.data, rad)}" for art, rad in problemer]
+        return "\n".join(linjer)
+
+    def sjekk_tabell(self, data=None, problemer=None):
+        # data / problemer: en kopi av tabellen som allerede er sjekket i en annen prosess
+        data = self.data if data is None else data
+        problemer = overlaps.find_problems(data) if problemer is None else problemer
+        if not problemer:
+            return ''
+        return f"{len(problemer)} doble eller overlappende rader:\n" + overlaps.summary(data, problemer)
+
+    def slett_opptegnelse(self, indeks):
+        return self.historikk.delete(indeks)
 
     def beregn_total_arbeidstid(self):
-        total_tid = sum(self.tid_til_minutter(oppføring["Arbeidstid"]) for oppføring in self.data)
-        return total_tid
+        return self.data.totals.total
+
+    def rad(self, oppføring):
+        return shift_row(oppføring)
 
     def tid_til_minutter(self, tid):
         try:
-            timer, minutter = map(int, tid.split(":"))
-            return timer * 60 + minutter
+            return parse_duration(tid)
         except ValueError:
             raise ValueError("Ugyldig tidsformat. Bruk formatet HH:MM.") from None
 
     def beregn_arbeidstid(self, start, slutt, tok_pause):
-        slutt -= timedelta(minutes=30) if tok_pause else timedelta(minutes=0)
-        return (slutt - start).total_seconds() // 60
-
-    def zapisz_tabele_do_pdf(self, filename):
-        doc = SimpleDocTemplate(filename, pagesize=letter)
-        data = self.prepare_table_data()
-        table = Table(data)
-        self.apply_table_style(table)
-
-        elements = [table]
-        if self.table_header:
-            elements.insert(0, self.create_header())
-
-        doc.build(elements)
+        return work_minutes(start.hour * 60 + start.minute, slutt.hour * 60 + slutt.minute, tok_pause)
+
+    def zapisz_tabele_do_pdf(self, filename, data=None, progress=None):
+        # data is passed in when the PDF is built on a worker thread, so the
+        # rows are read on the Tk thread only
+        import pdf_export
+        if data is None:
+            data = self.prepare_table_data()
+        if self.page_cache is None:
+            self.page_cache = pdf_export.PageCache()
+        pdf_export.build_pdf_cached(filename, data, self.table_header, self.page_cache, progress=progress)
+
+    def lagre_som_bilder(self, filename, data=None, progress=None):
+        # PNG / JPG / WebP sider og miniatyrer rett fra minnet, uten PDF-fil
+        import pdf_export
+        from image_export import export_images
+        if data is None:
+            data = self.prepare_table_data()
+        if self.page_cache is None:
+            self.page_cache = pdf_export.PageCache()
+        return export_images(filename, data, self.table_header, self.page_cache, progress=progress)
 
     def prepare_table_data(self):
-        table_data = [["Dato", "Kunde/Adresse", "Starttid", "Sluttid", "Tok pause", "Arbeidstid"]]
-        for oppføring in self.data:
-            table_data.append(list(oppføring.values()))
-        sum_row = ["Sum Timer", "", "", "", "", f"{int(self.sum_timer // 60)}:{int(self.sum_timer % 60):02d}"]
-        table_data.append(sum_row)
-        return table_data
+        return shift_table_data(self.data, self.sum_timer)
 
     def apply_table_style(self, table):
-        style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -2), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)])
-
-        green_style = TableStyle([
-            ('BACKGROUND', (-1, -1), (-1, -1), colors.green),
-            ('TEXTCOLOR', (-1, -1), (-1, -1), colors.white)])
-
-        table.setStyle(style)
-        table.setStyle(green_style)
+        import pdf_export
+        pdf_export.apply_table_style(table)
 
     def create_header(self):
-        return Paragraph(self.table_header, styles['Title'])
+        import pdf_export
+        return pdf_export.create_header(self.table_header)
 
-    def konwertuj_pdf_do_jpg(self, pdf_filename, output_folder, quality=100):
-        pdf_document = fitz.open(pdf_filename)
-        total_pages = pdf_document.page_count
+    def konwertuj_pdf_do_jpg(self, pdf_filename, output_folder, quality=100, dpi=72, progress=None):
+        from rasterizer import rasterize_pdf
+        return rasterize_pdf(pdf_filename, output_folder, dpi=dpi, quality=quality, progress=progress)
 
-        for page_number in range(total_pages):
-            page = pdf_document[page_number]
-            pixmap = page.get_pixmap()
-            image = Image.frombytes("RGB", [pixmap.width, pixmap.height], pixmap.samples)
-            image_path = os.path.join(output_folder, f"page_{page_number + 1}.jpg")
-
-            try:
-                image.save(image_path, "JPEG", quality=quality)
-            except Exception as e:
-                print(f"Błąd podczas zapisywania strony {page_number + 1}: {e}")
+    def kan_lukkes(self):
+        if self.økt or not self.data:
+            return True
+        return messagebox.askyesno('Uwaga', 'Czy na pewno chcesz zamknąć program? Dane nie są zapisane, '
+                                            'można je odzyskać przy następnym uruchomieniu.')
 
     def on_close(self):
-        if self.data:
-            response = messagebox.askyesno('Uwaga', 'Czy na pewno chcesz zamknąć program? Niezapisane dane zostaną utracone.')
-            if not response:
-                return
+        if self.økt:
+            self.økt.close()
+        if self.autosave:
+            self.autosave.close(keep=bool(self.data))
         root.destroy()
 
 
 class AnsattProgram:
-    def __init__(self, master):
+    def __init__(self, master, virtual=False, økt=None):
         self.master = master
         master.title("WojThmas Soft beta 1.0")
         master.geometry("1005x800")
 
-        self.ansatt = Ansatt()
+        try:
+            self.ansatt = Ansatt(økt)
+        except ValueError as e:
+            messagebox.showerror('Feil', f'{e}\nStarter med en tom tabell.')
+            self.ansatt = Ansatt()
+        if self.ansatt.økt is None:
+            self.start_autosave()
+        # Only the visible rows are kept in the Treeview
+        self.virtual = virtual or len(self.ansatt.data) > VIRTUAL_ROWS
+        self.jobber = JobScheduler(master)
+        self.rammer = FrameScheduler(master)  # Størrelse og etiketter oppdateres høyst én gang per bilde
         self.author_info = "Program created by: [Wojciech K. i Thomas O. Polish-Norwegian grammatical errors were left on purpose:)]"
 
         self.create_interface()
 
+    def start_autosave(self):
+        # Tabellen lagres i bakgrunnen og kan hentes tilbake ved neste oppstart
+        import autosave
+        from storage import default_session_path
+        sti = default_session_path("autosave-v2")
+        funnet = autosave.find(sti)
+        if funnet and messagebox.askyesno('Gjenopprett', f'{funnet[0]} rader fra {funnet[1]} ble ikke lagret. '
+                                                         f'Vil du hente dem tilbake?'):
+            try:
+                autosave.restore(sti, self.ansatt.data)
+            except (OSError, ValueError) as e:
+                messagebox.showerror('Feil', f'Kunne ikke hente radene: {e}')
+        self.ansatt.autosave = autosave.Autosave(self.master, self.ansatt.data, sti)
+
     def create_interface(self):
         øverste_ramme = tk.Frame(self.master)
         øverste_ramme.pack(side=tk.TOP, pady=10, fill=tk.X)
@@ -146,22 +184,10 @@ class AnsattProgram:
         self.inndata_navn.grid(row=len(etiketter) + 3, column=1, pady=5, padx=10, sticky="w")
 
         # Dodanie loga
-        logo_path = "logo.png"  # Zmienić na nazwę pliku PNG z logo
-        if getattr(sys, 'frozen', False):
-            # The application is frozen (compiled to .exe)
-            logo_full_path = os.path.join(os.path.dirname(sys.argv[0]), logo_path)
-        else:
-            # The application is not frozen
-            logo_full_path = os.path.join(os.path.dirname(__file__), logo_path)
-
-        if os.path.exists(logo_full_path):
-            self.logo_image = Image.open(logo_full_path)
-            self.logo_image.thumbnail((250, 250))
-            self.logo_image = ImageTk.PhotoImage(self.logo_image)
+        self.logo_image = assets.logo()
+        if self.logo_image is not None:
             logo_label = tk.Label(øverste_ramme, image=self.logo_image)
             logo_label.grid(row=2, column=6, rowspan=6, padx=0)
-        else:
-            print(f"File not found: {logo_full_path}")
 
         knapper_ramme = tk.Frame(øverste_ramme)
         knapper_ramme.grid(row=len(etiketter) + 4, column=0, columnspan=2, pady=10)
@@ -177,10 +203,29 @@ class AnsattProgram:
         tk.Button(knapper_ramme, text='Set Table Header', command=self.set_table_header,
                   font=("Arial", 12)).grid(row=0, column=4)
         tk.Button(knapper_ramme, text='Info', command=self.show_info, font=("Arial", 12)).grid(row=0, column=5)  # Dodany przycisk "Info"
+        tk.Button(knapper_ramme, text='Angre', command=self.angre,
+                  font=("Arial", 12)).grid(row=1, column=0)
+        tk.Button(knapper_ramme, text='Gjør om', command=self.gjør_om,
+                  font=("Arial", 12)).grid(row=1, column=1)
+        tk.Button(knapper_ramme, text='Slett rad', command=self.slett_rad,
+                  font=("Arial", 12)).grid(row=1, column=2)
+        self.avbryt_knapp = tk.Button(knapper_ramme, text='Avbryt', command=self.jobber.cancel_all,
+                                      font=("Arial", 12), state=tk.DISABLED)
+        self.avbryt_knapp.grid(row=1, column=3)
+        tk.Button(knapper_ramme, text='Importer fil', command=self.importer_fil,
+                  font=("Arial", 12)).grid(row=1, column=4)
+        tk.Button(knapper_ramme, text='Lagre som bilde', command=self.lagre_som_bilder,
+                  font=("Arial", 12)).grid(row=1, column=5)
+
+        self.etikett_status = tk.Label(øverste_ramme, text='', font=("Arial", 10), fg="gray")
+        self.etikett_status.grid(row=len(etiketter) + 5, column=0, columnspan=2, padx=10, sticky="w")
 
         self.opprett_ark()
 
     def opprett_ark(self):
+        self.statuslinje = StatusBar(self.master)
+        self.statuslinje.pack(side=tk.BOTTOM, fill=tk.X)
+
         ark_ramme = tk.Frame(self.master)
         ark_ramme.pack(side=tk.LEFT, pady=10, fill=tk.BOTH, expand=True)
 
@@ -195,18 +240,21 @@ class AnsattProgram:
         for overskrift in kolonneoverskrifter:
             self.tre.heading(overskrift, text=overskrift)
 
-        kolonne_bredder = [100, 100, 150, 150, 100, 150]
-        for i, bredde in enumerate(kolonne_bredder):
+        self.kolonne_bredder = [100, 100, 150, 150, 100, 150]
+        for i, bredde in enumerate(self.kolonne_bredder):
             self.tre.column(kolonneoverskrifter[i], width=bredde)
 
         self.tre.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(ark_ramme, orient="vertical")
+        self.scrollbar.pack(side="right", fill="y")
+        self.lag_tabellvisning()
 
-        scrollbar = ttk.Scrollbar(ark_ramme, orient="vertical", command=self.tre.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.tre.configure(yscrollcommand=scrollbar.set)
-
-        self.master.bind("<Configure>", lambda event: self.resize_columns(event))
+        self.master.bind("<Configure>", self.ved_endret_størrelse)
         self.master.bind("<Control-s>", lambda event: self.zapisz_tabele_do_pdf())
+        self.master.bind("<Control-z>", lambda event: self.angre())
+        self.master.bind("<Control-y>", lambda event: self.gjør_om())
+        if metrics.enabled:
+            self.master.bind("<F12>", lambda event: metrics.open_panel(self.master))
 
         self.ansatt.row_height = int(self.tre.winfo_reqheight() / 30)
 
@@ -214,40 +262,122 @@ class AnsattProgram:
                                             font=("Arial", 14, "bold"), fg="blue")
         self.etikett_totalt_timer.pack(side=tk.RIGHT, pady=10, padx=10)
 
-    def resize_columns(self, event=None):
-        tree_width = self.tre.winfo_width()
-        total_width = sum([self.tre.column(c)["width"] for c in self.tre["columns"]])
-        factor = tree_width / total_width if total_width > 0 else 1
+    def lag_tabellvisning(self):
+        tabell_klasse = VirtualTreeviewModel if self.virtual else TreeviewModel
+        self.tabell = tabell_klasse(self.tre, self.ansatt.data, self.ansatt.rad, scheduler=self.rammer)
+        self.tabell.attach_scrollbar(self.scrollbar)
+
+    def bytt_til_virtuell_tabell(self):
+        # Stor import i et lite ark: fra nå av er bare de synlige radene i Treeview
+        self.tabell.detach()
+        self.virtual = True
+        self.lag_tabellvisning()
+
+    def ved_endret_størrelse(self, event):
+        # <Configure> på hovedvinduet kommer også for hver widget inni det
+        if event.widget is self.master:
+            self.rammer.debounce("resize", self.resize_columns)
 
-        for c in self.tre["columns"]:
-            self.tre.column(c, width=int(self.tre.column(c)["width"] * factor))
+    def resize_columns(self, event=None):
+        fit_columns(self.tre, self.kolonne_bredder)
 
     def zapisz_tabele_do_pdf(self, event=None):
-        try:
-            filename = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
-            if filename:
-                self.ansatt.zapisz_tabele_do_pdf(filename)
-                messagebox.showinfo('Suksess', 'Tabell og sum Tabell lagret som PDF.')
-        except Exception as e:
-            messagebox.showerror('Feil', str(e))
+        filename = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
+        if filename:
+            self.start_jobb('PDF', self.ansatt.zapisz_tabele_do_pdf, filename, self.ansatt.prepare_table_data(),
+                            melding='Tabell og sum Tabell lagret som PDF.')
+
+    def lagre_som_bilder(self):
+        filename = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[
+            ("PNG", "*.png"), ("JPEG", "*.jpg"), ("WebP", "*.webp")])
+        if filename:
+            self.start_jobb('Bilde', self.ansatt.lagre_som_bilder, filename, self.ansatt.prepare_table_data(),
+                            melding='Tabell lagret som bilder.')
 
     def konwertuj_pdf_do_jpg(self):
-        try:
-            pdf_filename = filedialog.askopenfilename(filetypes=[("PDF files", "*.pdf")])
-            if pdf_filename:
-                output_folder = filedialog.askdirectory()
-                self.ansatt.konwertuj_pdf_do_jpg(pdf_filename, output_folder)
-                messagebox.showinfo('Suksess', 'PDF konvertert til JPG.')
-        except Exception as e:
+        pdf_filename = filedialog.askopenfilename(filetypes=[("PDF files", "*.pdf")])
+        if pdf_filename:
+            output_folder = filedialog.askdirectory()
+            if output_folder:
+                self.start_jobb('JPG', self.ansatt.konwertuj_pdf_do_jpg, pdf_filename, output_folder,
+                                ved_ferdig=self.jpg_ferdig)
+
+    def jpg_ferdig(self, feilede):
+        # feilede: sidenumre (fra 1) som ikke kunne lagres
+        if feilede:
+            messagebox.showwarning('JPG', f"PDF konvertert til JPG, men {len(feilede)} sider kunne ikke lagres: "
+                                          f"{', '.join(map(str, feilede))}")
+        else:
+            messagebox.showinfo('Suksess', 'PDF konvertert til JPG.')
+
+    def start_jobb(self, navn, funksjon, *args, melding=None, ved_ferdig=None, enhet='side', prosess=False):
+        def ferdig(jobb, resultat):
+            self.jobb_avsluttet()
+            if ved_ferdig:
+                ved_ferdig(resultat)
+            else:
+                messagebox.showinfo('Suksess', melding)
+
+        def feil(jobb, e):
+            self.jobb_avsluttet()
+            metrics.count(f"errors.{navn}")
             messagebox.showerror('Feil', str(e))
 
+        self.etikett_status.config(text=f'{navn}...')
+        self.avbryt_knapp.config(state=tk.NORMAL)
+        self.jobber.submit(navn, funksjon, *args, process=prosess, on_done=ferdig, on_error=feil,
+                           on_progress=lambda jobb, ferdig, totalt: self.vis_fremdrift(jobb, ferdig, totalt, enhet),
+                           on_cancel=lambda jobb: self.jobb_avsluttet())
+
+    def vis_fremdrift(self, jobb, ferdig, totalt, enhet='side'):
+        if totalt:
+            self.etikett_status.config(text=f'{jobb.name}: {enhet} {ferdig} av {totalt}')
+        else:
+            self.etikett_status.config(text=f'{jobb.name}: {enhet} {ferdig}')
+
+    def importer_fil(self):
+        filnavn = filedialog.askopenfilename(filetypes=[("CSV / JSON Lines / PDF", "*.csv *.jsonl *.pdf"),
+                                                        ("All files", "*.*")])
+        if filnavn:
+            from importer import read_file
+            # The file is parsed on a worker thread, the rows are added on the Tk thread
+            self.start_jobb('Import', read_file, filnavn, ved_ferdig=self.importer_ferdig, enhet='rader')
+
+    def importer_ferdig(self, resultat):
+        from importer import apply_batch
+        batches, rapport = resultat
+        if not self.virtual and len(self.ansatt.data) + sum(len(batch.days) for batch in batches) > VIRTUAL_ROWS:
+            self.bytt_til_virtuell_tabell()
+        with metrics.span("import"):
+            for batch in batches:
+                apply_batch(self.ansatt.data, batch)
+        metrics.count("import.rows", rapport.imported)
+        self.oppdater_totalt()
+
+        # Sjekken tar sekunder for en million rader, så den kjører på en kopi i en annen prosess
+        kopi = self.ansatt.data.copy()
+        self.start_jobb('Sjekk', overlaps.find_problems, kopi, prosess=True,
+                        ved_ferdig=lambda problemer: self.sjekk_ferdig(rapport, kopi, problemer))
+
+    def sjekk_ferdig(self, rapport, data, problemer):
+        problemer = self.ansatt.sjekk_tabell(data, problemer)
+        if rapport.errors or problemer:
+            messagebox.showwarning('Import', '\n\n'.join(tekst for tekst in (rapport.summary(), problemer) if tekst))
+        else:
+            messagebox.showinfo('Import', rapport.summary())
+
+    def jobb_avsluttet(self):
+        if not self.jobber.running():
+            self.etikett_status.config(text='')
+            self.avbryt_knapp.config(state=tk.DISABLED)
+
     def legg_til_i_tabellen(self):
         dato, kunde_adresse, start_tid, slutt_tid = [inndata.get() for inndata in
                                                      [self.inndata_dato, self.inndata_kunde_adresse, self.inndata_start,
                                                       self.inndata_slutt]]
 
         if not self.sjekk_datoformat(dato):
-            messagebox.showerror('Feil', 'Ugyldig datoformat. Bruk formatet DD-MM-YYYY.')
+            self.statuslinje.show('Ugyldig datoformat. Bruk formatet DD-MM-YYYY.', "error")
             return
 
         try:
@@ -255,26 +385,49 @@ class AnsattProgram:
             slutt = self.parse_tid(slutt_tid)
 
             arbeidstid = self.ansatt.beregn_arbeidstid(start, slutt, self.pause_var.get())
-            arbeidstid_str = f"{int(arbeidstid // 60)}:{int(arbeidstid % 60):02d}"
+
+            problemer = self.ansatt.sjekk_opptegnelse(dato, kunde_adresse, start.hour * 60 + start.minute,
+                                                      slutt.hour * 60 + slutt.minute, self.pause_var.get(), arbeidstid)
 
             self.ansatt.legg_til_opptegnelse(dato, kunde_adresse, start_tid, slutt_tid,
-                                             'Ja' if self.pause_var.get() else 'Nei', arbeidstid_str)
+                                             'Ja' if self.pause_var.get() else 'Nei', arbeidstid)
+        except ValueError as e:
+            self.statuslinje.show(str(e), "error")
+            return
 
-            verdier = (dato, kunde_adresse, start_tid, slutt_tid,
-                       'Ja' if self.pause_var.get() else 'Nei', arbeidstid_str)
+        self.oppdater_totalt()
+        if problemer:
+            self.statuslinje.show('Lagt til. ' + problemer.replace('\n', '; ') + ' (Ctrl+Z for å angre)', "warning")
+        else:
+            self.statuslinje.show('Oppføring lagt til i tabellen.', "ok")
 
-            self.tre.insert("", "end", values=verdier)
+    def oppdater_totalt(self):
+        self.rammer.request("total", self.oppdater_totalt_etikett)
 
+    def oppdater_totalt_etikett(self):
+        with metrics.span("total"):
             totalt_timer = self.ansatt.beregn_total_arbeidstid()
             timer, minutter = divmod(totalt_timer, 60)
             self.etikett_totalt_timer.config(
                 text=f"Totalt antall timer: {timer} timer {minutter} minutter",
                 font=("Arial", 12, "bold"))
 
-            messagebox.showinfo('Suksess', 'Oppføring lagt til i tabellen.')
+    def angre(self):
+        if self.ansatt.historikk.undo():
+            self.oppdater_totalt()
 
-        except ValueError as e:
-            messagebox.showerror('Feil', str(e))
+    def gjør_om(self):
+        if self.ansatt.historikk.redo():
+            self.oppdater_totalt()
+
+    def slett_rad(self):
+        valgt = self.tre.selection()
+        if not valgt:
+            self.statuslinje.show('Velg en rad å slette.', "warning")
+            return
+
+        self.ansatt.slett_opptegnelse(self.tabell.index_of(valgt[0]))
+        self.oppdater_totalt()
 
     def sjekk_datoformat(self, dato):
         try:
@@ -308,12 +461,31 @@ class AnsattProgram:
         messagebox.showinfo('Info', self.author_info)
 
     def on_close(self):
+        # Alle spørsmål først: etter et "Nei" skal programmet fortsatt virke
+        if self.jobber.running():
+            if not messagebox.askyesno('Uwaga', 'Eksport pågår. Vil du avbryte den og lukke programmet?'):
+                return
+        if not self.ansatt.kan_lukkes():
+            return
+
+        self.jobber.shutdown()
+        if metrics.enabled:
+            from storage import default_session_path
+            metrics.write(default_session_path("metrics-v2.json"))
         self.ansatt.on_close()
 
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # rasterizer worker processes in the .exe build
+    if len(sys.argv) > 1 and not sys.argv[1].startswith("-"):
+        # Command line mode, e.g. "worker v2.py" total shifts.csv - no window is created
+        import cli
+        sys.exit(cli.main())
+    from storage import session_path
+    metrics.configure(sys.argv)  # --metrics / --metrics-port PORT, F12 shows the slowest operations
     root = tk.Tk()
-    app = AnsattProgram(root)
+    app = AnsattProgram(root, virtual="--virtual" in sys.argv, økt=session_path(sys.argv, "v2.db"))
     root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
 